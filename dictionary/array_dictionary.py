@@ -1,6 +1,7 @@
 from dictionary.word_frequency import WordFrequency
 from dictionary.base_dictionary import BaseDictionary
 import bisect
+import heapq
 
 # ------------------------------------------------------------------------
 # This class is required TO BE IMPLEMENTED
@@ -14,6 +15,8 @@ class ArrayDictionary(BaseDictionary):
 
     def __init__(self):
         self.array_dictionary = []
+        # sorted words kept parallel to array_dictionary, used as the bisect key array
+        self.keys = []
 
     def build_dictionary(self, words_frequencies: [WordFrequency]):
         """
@@ -22,6 +25,33 @@ class ArrayDictionary(BaseDictionary):
         """
         # 1. assign sorted words_frequencies to self.array_dictionary
         self.array_dictionary = sorted(words_frequencies, key=lambda x: x.word)
+        # 2. build the parallel key array in the same order
+        self.keys = [wf_object.word for wf_object in self.array_dictionary]
+
+    def _index_of(self, word: str) -> int:
+        """
+        binary search for a word
+        @param word: the word to be located
+        @return: position of 'word' in the array, or -1 if NOT found
+        """
+        idx = bisect.bisect_left(self.keys, word)
+        if idx < len(self.keys) and self.keys[idx] == word:
+            return idx
+
+        return -1
+
+    def _prefix_range(self, prefix_word: str, start: int = 0) -> (int, int):
+        """
+        locate the slice of the array whose words start with 'prefix_word'
+        @param prefix_word: the prefix to be located
+        @param start: position known not to be past the slice
+        @return: (lo, hi) so that self.array_dictionary[lo:hi] holds every match
+        """
+        lo = bisect.bisect_left(self.keys, prefix_word, start)
+        # every word starting with prefix_word sorts below prefix_word + the largest code point
+        hi = bisect.bisect_left(self.keys, prefix_word + '\U0010ffff', lo)
+
+        return lo, hi
 
     def search(self, word: str) -> int:
         """
@@ -29,12 +59,12 @@ class ArrayDictionary(BaseDictionary):
         @param word: the word to be searched
         @return: frequency > 0 if found and 0 if NOT found
         """
-        # 1. loop through array_dictionary to search
-        for wf_object in self.array_dictionary:
-            if word == wf_object.word:
-                return wf_object.frequency
+        # 1. binary search the key array
+        idx = self._index_of(word)
+        if idx < 0:
+            return 0
 
-        return 0
+        return self.array_dictionary[idx].frequency
 
     def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
         """
@@ -42,17 +72,15 @@ class ArrayDictionary(BaseDictionary):
         @param word_frequency: (word, frequency) to be added
         :return: True whether succeeded, False when word is already in the dictionary
         """
-        # 1. loop through array_dictionary to check word already exists
-        word_validation = True
-        for wf_object in self.array_dictionary:
-            if word_frequency.word == wf_object.word:
-                word_validation = False
-        # 2. if word doesn't exist, add the @param(word_frequency) to the array_dictionary and sort it.
-        if word_validation:
-            self.array_dictionary.append((word_frequency))
-            self.array_dictionary.sort(key=lambda x: x.word)
+        # 1. binary search for the insertion point and check the word doesn't exist yet
+        idx = bisect.bisect_left(self.keys, word_frequency.word)
+        if idx < len(self.keys) and self.keys[idx] == word_frequency.word:
+            return False
+        # 2. insert into both arrays at that position so they stay sorted
+        self.keys.insert(idx, word_frequency.word)
+        self.array_dictionary.insert(idx, word_frequency)
 
-        return word_validation
+        return True
 
     def delete_word(self, word: str) -> bool:
         """
@@ -60,36 +88,120 @@ class ArrayDictionary(BaseDictionary):
         @param word: word to be deleted
         @return: whether succeeded, e.g. return False when point not found
         # """
-        # 1. loop through the array_dictionary to find the position of 'word' in the list with idx var
-        word_validation = False
-        count = -1
-        idx = None
-        for wf_object in self.array_dictionary:
-            count += 1
-            if word == wf_object.word:
-                word_validation = True
-                idx = count
-        # 2. if 'word' doesn't exist, remove it from the array_dictionary by pop() with index
-        if idx:
+        # 1. binary search for the position of 'word'
+        idx = self._index_of(word)
+        if idx < 0:
+            return False
+        # 2. remove it from both arrays by pop() with index
+        self.keys.pop(idx)
+        self.array_dictionary.pop(idx)
+
+        return True
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        idx = self._index_of(word)
+        if idx < 0:
+            return False
+        if frequency <= 0:
+            self.keys.pop(idx)
             self.array_dictionary.pop(idx)
+        else:
+            # a fresh object, the old one may still be held by the caller that added it
+            self.array_dictionary[idx] = WordFrequency(word, frequency)
 
-        return word_validation
+        return True
 
-    def autocomplete(self, prefix_word: str) -> [WordFrequency]:
+    def merge_frequencies(self, pairs):
         """
-        return a list of 3 most-frequent words in the dictionary that have 'prefix_word' as a prefix
-        @param prefix_word: word to be autocompleted
-        @return: a list (could be empty) of (at most) 3 most-frequent words with prefix 'prefix_word'
+        fold a stream of frequency deltas into the dictionary, as increment() would one pair at a time
+        A few words are updated in place; a larger batch is applied in one pass over the
+        array followed by a sort that only has to merge the new words in.
+        @param pairs: iterable of (word, delta)
         """
-        # collect all frequent words by prefix
-        frequent_words = []
+        net = self._net_frequencies(pairs, self.search)
+        # 1. each insert or pop shifts the array, so a few words are cheaper one at a time
+        if len(net) * 64 < len(self.keys):
+            for word, frequency in net.items():
+                if not self.update_frequency(word, frequency) and frequency > 0:
+                    self.add_word_frequency(WordFrequency(word, frequency))
+            return
+        # 2. one pass rewriting the changed words and dropping the deleted ones
+        kept = []
         for wf_object in self.array_dictionary:
-            if prefix_word[0] == wf_object.word[0] and prefix_word in wf_object.word:
-                frequent_words.append(wf_object)
-        frequent_words.sort(key=lambda x: x.frequency, reverse=True)
-        # extract most three frequent words
-        most_frequent_words = []
-        for frequent_word in frequent_words[:3]:
-            most_frequent_words.append(frequent_word)
-
-        return most_frequent_words
\ No newline at end of file
+            frequency = net.pop(wf_object.word, None)
+            if frequency is None or frequency == wf_object.frequency:
+                kept.append(wf_object)
+            elif frequency > 0:
+                kept.append(WordFrequency(wf_object.word, frequency))
+        # 3. what's left in 'net' is new, and sorting two sorted runs is a linear merge
+        kept.extend(WordFrequency(word, frequency) for word, frequency in sorted(net.items()) if frequency > 0)
+        self.build_dictionary(kept)
+
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'prefix_word' as a prefix
+        @param prefix_word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'prefix_word'
+        """
+        # 1. words sharing the prefix are contiguous in the sorted array
+        lo, hi = self._prefix_range(prefix_word)
+        if self.counters is not None:
+            self.counters['array.scanned'] += hi - lo
+        # 2. a heap of k + offset picks the most frequent, ties stay in alphabetical order
+        return heapq.nlargest(k + offset, self.array_dictionary[lo:hi], key=lambda x: x.frequency)[offset:]
+
+    def iter_prefix(self, prefix_word: str):
+        """
+        generate every word in the dictionary that has 'prefix_word' as a prefix, lazily
+        @param prefix_word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        # the matches are already in order, so walk the range without copying it
+        lo, hi = self._prefix_range(prefix_word)
+        for idx in range(lo, hi):
+            yield self.array_dictionary[idx]
+
+    def search_many(self, words: [str]) -> [int]:
+        """
+        search for several words
+        The distinct words are merge-walked against the key array in sorted order, each
+        step binary searching only the part of the array not yet passed.
+        @param words: the words to be searched
+        @return: the frequency of each word, 0 if NOT found, in the same order
+        """
+        # 1. merge-walk the sorted distinct queries against the sorted keys
+        frequency_of = {}
+        idx = 0
+        for word in sorted(set(words)):
+            idx = bisect.bisect_left(self.keys, word, idx)
+            found = idx < len(self.keys) and self.keys[idx] == word
+            frequency_of[word] = self.array_dictionary[idx].frequency if found else 0
+        # 2. answer in the original order
+        return [frequency_of[word] for word in words]
+
+    def autocomplete_many(self, prefix_words: [str], k: int = 3) -> [[WordFrequency]]:
+        """
+        autocomplete several prefixes
+        The distinct prefixes are handled in sorted order, so each range search starts
+        where the previous one began.
+        @param prefix_words: the prefixes to be autocompleted
+        @param k: number of words wanted per prefix
+        @return: the autocomplete() list of each prefix, in the same order
+        """
+        completions = {}
+        lo = 0
+        for prefix_word in sorted(set(prefix_words)):
+            lo, hi = self._prefix_range(prefix_word, lo)
+            if self.counters is not None:
+                self.counters['array.scanned'] += hi - lo
+            completions[prefix_word] = heapq.nlargest(k, self.array_dictionary[lo:hi], key=lambda x: x.frequency)
+
+        return [list(completions[prefix_word]) for prefix_word in prefix_words]
@@ -0,0 +1,111 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.array_dictionary import ArrayDictionary
+from dictionary.columnar_array_dictionary import ColumnarArrayDictionary
+from dictionary.linkedlist_dictionary import LinkedListDictionary
+from dictionary.trie_dictionary import TrieDictionary
+from dictionary.radix_trie_dictionary import RadixTrieDictionary
+from dictionary.static_trie_dictionary import StaticTrieDictionary
+from dictionary.sharded_dictionary import ShardedDictionary
+from dictionary.hash_dictionary import HashDictionary
+from dictionary.infix_dictionary import InfixDictionary
+from dictionary.journal import JournaledDictionary
+from dictionary.loader import iter_columns, iter_word_frequencies, load_columns
+from contextlib import nullcontext
+
+# ------------------------------------------------------------------------
+# The dictionary implementations by <approach> name, as accepted on the
+# command line of dictionary_file_based.py, and the way the entry points
+# (dictionary_file_based.py, dictionary_server.py) load one of them
+# ------------------------------------------------------------------------
+
+BACKENDS = {
+    'array': ArrayDictionary,
+    'columnar': ColumnarArrayDictionary,
+    'linkedlist': LinkedListDictionary,
+    'trie': TrieDictionary,
+    'radixtrie': RadixTrieDictionary,
+    'statictrie': StaticTrieDictionary,
+    'sharded': ShardedDictionary,
+    'hashtable': HashDictionary,
+}
+
+
+def create_dictionary(approach: str) -> BaseDictionary:
+    """
+    @param approach: name of the implementation
+    @return: a new, empty dictionary of that implementation
+    @raise KeyError: when the name is unknown
+    """
+    return BACKENDS[approach]()
+
+
+def load_agent(approach: str, data_filename: str, journal: str = None, merges: [str] = (), infix: bool = False,
+               phase=None) -> BaseDictionary:
+    """
+    create a dictionary and fill it: a journal directory recovers its own words and the data file only
+    seeds an empty one, a .snap snapshot is mapped instead of rebuilt, and any other data file is parsed
+    and built. Then the frequency deltas are folded in, through the trigram index if there is one.
+    @param approach: name of the implementation
+    @param data_filename: data file, or .snap snapshot written by 'python3 -m dictionary.snapshot'
+    @param journal: journal directory recording every change from now on, if any
+    @param merges: files of word/delta lines folded into the words once loaded
+    @param infix: wrap the dictionary in a trigram index for IC commands
+    @param phase: Profiler.phase() to time the steps with, the data file is then read apart from the build
+    @return: the dictionary, inside JournaledDictionary and then InfixDictionary when asked for
+    @raise FileNotFoundError: when the data file or a delta file doesn't exist
+    @raise ValueError: when the data can't be loaded, e.g. a snapshot of another backend or a malformed line
+    """
+    agent = create_dictionary(approach)
+    timed = phase is not None
+    phase = phase or (lambda name: nullcontext())
+    try:
+        if data_filename.endswith('.snap') and not hasattr(agent, 'load_snapshot'):
+            raise ValueError(f"approach '{approach}' can't load snapshots")
+        # 1. the words, from the journal directory, the snapshot or the data file
+        if journal:
+            with phase('recover'):
+                agent = JournaledDictionary.recover(agent, journal, data_filename)
+        elif data_filename.endswith('.snap'):
+            with phase('load'):
+                agent = agent.load_snapshot(data_filename)
+        # columnar backends take the parsed columns as they are
+        elif hasattr(agent, 'build_from_columns'):
+            with phase('load'):
+                columns = load_columns(data_filename)
+            with phase('build'):
+                agent.build_from_columns(*columns)
+        # the others are fed a stream of WordFrequency
+        else:
+            words_frequencies = iter_word_frequencies(data_filename)
+            if timed:
+                # read the whole file first so loading and building are timed apart
+                with phase('load'):
+                    words_frequencies = list(words_frequencies)
+            with phase('build'):
+                agent.build_dictionary(words_frequencies)
+        # 2. the trigram index, built from the words just loaded
+        if infix:
+            with phase('index'):
+                agent = InfixDictionary(agent)
+        # 3. the frequency deltas, a chunk of lines at a time
+        for merge_filename in merges:
+            with phase('merge'):
+                for words, deltas in iter_columns(merge_filename):
+                    agent.merge_frequencies(zip(words, deltas))
+    except BaseException:
+        close_agent(agent)
+        raise
+
+    return agent
+
+
+def close_agent(agent: BaseDictionary):
+    """
+    close every dictionary holding resources in a chain of wrappers, outermost first,
+    e.g. commit a journal and then stop the worker processes of a sharded backend
+    @param agent: the dictionary returned by load_agent(), possibly wrapped further
+    """
+    while agent is not None:
+        if hasattr(agent, 'close'):
+            agent.close()
+        agent = getattr(agent, 'agent', None)
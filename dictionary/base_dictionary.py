@@ -9,6 +9,9 @@ from dictionary.word_frequency import WordFrequency
 # -------------------------------------------------
 
 class BaseDictionary:
+    # set to a collections.Counter by dictionary.profiling to collect backend-specific work counts
+    counters = None
+
     def build_dictionary(self, words_frequencies: [WordFrequency]):
         """
         construct the data structure to store nodes
@@ -40,10 +43,146 @@ class BaseDictionary:
         """
         pass
 
-    def autocomplete(self, prefix_word: str) -> [WordFrequency]:
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
         """
-        return a list of 3 most-frequent words in the dictionary that have 'prefix_word' as a prefix
+        return a list of k most-frequent words in the dictionary that have 'prefix_word' as a prefix
         @param prefix_word: word to be autocompleted
-        @return: a list (could be empty) of (at most) 3 most-frequent words with prefix 'prefix_word'
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'prefix_word',
+                 ties broken alphabetically
+        """
+        pass
+
+    def iter_prefix(self, prefix_word: str):
+        """
+        generate every word in the dictionary that has 'prefix_word' as a prefix, lazily
+        The dictionary must not be changed while the generator is in use.
+        @param prefix_word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
         """
         pass
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary, backends may override this
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        if not self.search(word):
+            return False
+        self.delete_word(word)
+        if frequency > 0:
+            self.add_word_frequency(WordFrequency(word, frequency))
+
+        return True
+
+    def increment(self, word: str, delta: int) -> int:
+        """
+        add a delta to the frequency of a word
+        A word that isn't in the dictionary yet is added with a positive delta, and a word
+        whose frequency drops to 0 or below is deleted.
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        frequency = self.search(word)
+        if frequency:
+            self.update_frequency(word, frequency + delta)
+        elif delta > 0:
+            self.add_word_frequency(WordFrequency(word, delta))
+
+        return max(frequency + delta, 0)
+
+    def merge_frequencies(self, pairs):
+        """
+        fold a stream of frequency deltas into the dictionary, as increment() would one pair at a time
+        Backends may override this with a bulk strategy.
+        @param pairs: iterable of (word, delta)
+        """
+        for word, delta in pairs:
+            self.increment(word, delta)
+
+    @staticmethod
+    def _net_frequencies(pairs, frequency_of) -> dict:
+        """
+        work out the outcome of a stream of deltas one word at a time
+        The words don't affect each other, so folding each word's deltas in stream order
+        gives what applying the stream pair by pair would.
+        @param pairs: iterable of (word, delta)
+        @param frequency_of: function giving the current frequency of a word, 0 if NOT found
+        @return: mapping of every word in the stream to its final frequency, 0 if it ends up deleted
+        """
+        net = {}
+        for word, delta in pairs:
+            frequency = net[word] if word in net else frequency_of(word)
+            net[word] = max(frequency + delta, 0)
+
+        return net
+
+    def search_many(self, words: [str]) -> [int]:
+        """
+        search for several words, backends may override this with a batched strategy
+        @param words: the words to be searched
+        @return: the frequency of each word, 0 if NOT found, in the same order
+        """
+        return [self.search(word) for word in words]
+
+    def autocomplete_many(self, prefix_words: [str], k: int = 3) -> [[WordFrequency]]:
+        """
+        autocomplete several prefixes, backends may override this with a batched strategy
+        @param prefix_words: the prefixes to be autocompleted
+        @param k: number of words wanted per prefix
+        @return: the autocomplete() list of each prefix, in the same order
+        """
+        return [self.autocomplete(prefix_word, k) for prefix_word in prefix_words]
+
+    def apply_commands(self, commands: [tuple]) -> list:
+        """
+        run a stream of parsed commands (see dictionary.commands) with sequential semantics
+        Each run of consecutive S/AC commands sees no mutation, so it is answered through
+        search_many() and autocomplete_many(); A/D commands are applied one at a time in order.
+        IC commands are answered by infix_search(), which dictionary.infix_dictionary provides.
+        @param commands: the parsed commands
+        @return: the result of each command, in the same order
+        """
+        results = []
+        reads = []
+        for command in commands:
+            if command[0] in ('S', 'AC', 'IC'):
+                reads.append(command)
+                continue
+            results.extend(self._apply_reads(reads))
+            reads = []
+            if command[0] == 'A':
+                results.append(self.add_word_frequency(WordFrequency(command[1], command[2])))
+            else:
+                results.append(self.delete_word(command[1]))
+        results.extend(self._apply_reads(reads))
+
+        return results
+
+    def _apply_reads(self, reads: [tuple]) -> list:
+        """
+        answer a run of S/AC commands with one search_many() call and one autocomplete_many() call per k,
+        and its IC commands one at a time
+        """
+        searched = iter(self.search_many([command[1] for command in reads if command[0] == 'S']))
+        # ('AC', prefix) asks for 3 completions, ('AC', prefix, k) for k, and the same goes for IC
+        limits = [command[2] if len(command) > 2 else 3 for command in reads]
+        completed = {}
+        for k in {limit for command, limit in zip(reads, limits) if command[0] == 'AC'}:
+            completed[k] = iter(self.autocomplete_many([command[1] for command, limit in zip(reads, limits)
+                                                        if command[0] == 'AC' and limit == k], k))
+
+        results = []
+        for command, limit in zip(reads, limits):
+            if command[0] == 'S':
+                results.append(next(searched))
+            elif command[0] == 'AC':
+                results.append(next(completed[limit]))
+            else:
+                results.append(self.infix_search(command[1], limit))
+
+        return results
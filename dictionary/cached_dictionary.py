@@ -0,0 +1,317 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.word_frequency import WordFrequency
+from collections import OrderedDict
+import time
+
+# ------------------------------------------------------------------------
+# Result cache for search and autocomplete in front of any dictionary
+#
+# Results are cached under ('S', word) and ('AC', prefix). A successful add
+# or delete of a word can only change the search result of that word and the
+# autocomplete results of its prefixes, so exactly those entries are evicted.
+# The entry of a prefix holds its best completions as far as they have been
+# asked for, so every page and every k up to that depth is a hit.
+# ------------------------------------------------------------------------
+
+# default number of cached results
+CACHE_SIZE = 1024
+
+_MISSING = object()
+
+
+class LRUCache:
+    '''
+    Bounded cache evicting the least recently used entry
+    '''
+
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, not {maxsize}")
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key, _MISSING)
+        if value is not _MISSING:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, key) -> bool:
+        return self.entries.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        self.entries.clear()
+
+
+class LFUCache:
+    '''
+    Bounded cache evicting the least frequently used entry, the least recently used among ties
+    '''
+
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, not {maxsize}")
+        self.maxsize = maxsize
+        self.entries = {}               # key = cache key, value = (value, use count)
+        self.by_count = {}              # key = use count, value = OrderedDict of the keys used that often
+        self.min_count = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _touch(self, key, value, count):
+        keys = self.by_count[count]
+        del keys[key]
+        if not keys:
+            del self.by_count[count]
+            if self.min_count == count:
+                self.min_count = count + 1
+        self.by_count.setdefault(count + 1, OrderedDict())[key] = None
+        self.entries[key] = (value, count + 1)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return _MISSING
+        self._touch(key, entry[0], entry[1])
+        return entry[0]
+
+    def put(self, key, value):
+        if key in self.entries:
+            self._touch(key, value, self.entries[key][1])
+            return
+        if len(self.entries) >= self.maxsize:
+            evicted, _ = self.by_count[self.min_count].popitem(last=False)
+            if not self.by_count[self.min_count]:
+                del self.by_count[self.min_count]
+            del self.entries[evicted]
+            self.evictions += 1
+        self.entries[key] = (value, 1)
+        self.by_count.setdefault(1, OrderedDict())[key] = None
+        self.min_count = 1
+
+    def discard(self, key) -> bool:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        keys = self.by_count[entry[1]]
+        del keys[key]
+        if not keys:
+            del self.by_count[entry[1]]
+            if self.min_count == entry[1]:
+                self.min_count = min(self.by_count, default=0)
+        return True
+
+    def clear(self):
+        self.entries.clear()
+        self.by_count.clear()
+        self.min_count = 0
+
+
+class TTLCache(LRUCache):
+    '''
+    Bounded LRU cache whose entries also expire a fixed number of seconds after being stored
+    '''
+
+    def __init__(self, maxsize: int, ttl: float, clock=time.monotonic):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self.clock = clock
+
+    def get(self, key):
+        entry = super().get(key)
+        if entry is _MISSING:
+            return _MISSING
+        value, expires = entry
+        if expires <= self.clock():
+            del self.entries[key]
+            self.evictions += 1
+            return _MISSING
+        return value
+
+    def put(self, key, value):
+        super().put(key, (value, self.clock() + self.ttl))
+
+
+POLICIES = ('lru', 'lfu', 'ttl')
+
+
+class CachedDictionary(BaseDictionary):
+    '''
+    Caches the search and autocomplete results of a wrapped dictionary
+    '''
+
+    def __init__(self, agent: BaseDictionary, maxsize: int = CACHE_SIZE, policy: str = 'lru', ttl: float = None):
+        """
+        @param agent: the dictionary to be wrapped
+        @param maxsize: most results kept at once, at least 1
+        @param policy: eviction policy, one of POLICIES
+        @param ttl: lifetime of an entry in seconds, required by the 'ttl' policy
+        """
+        if policy == 'lru':
+            self.cache = LRUCache(maxsize)
+        elif policy == 'lfu':
+            self.cache = LFUCache(maxsize)
+        elif policy == 'ttl':
+            if ttl is None:
+                raise ValueError("the 'ttl' policy needs a ttl")
+            self.cache = TTLCache(maxsize, ttl)
+        else:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}, not '{policy}'")
+        self.agent = agent
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def stats(self) -> dict:
+        """
+        @return: hit/miss statistics of the cache
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.cache.evictions, 'invalidations': self.invalidations,
+                'size': len(self.cache)}
+
+    def _cached(self, key, compute):
+        value = self.cache.get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute(key[1])
+        self.cache.put(key, value)
+        return value
+
+    def _invalidate(self, word: str):
+        """
+        evict the results a change to 'word' can affect: its search and the autocomplete of its prefixes
+        """
+        keys = [('S', word)] + [('AC', word[:length]) for length in range(len(word) + 1)]
+        for key in keys:
+            if self.cache.discard(key):
+                self.invalidations += 1
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        """
+        construct the data structure to store nodes
+        Every cached result is dropped first.
+        @param words_frequencies: list of (word, frequency) to be stored
+        """
+        self.cache.clear()
+        self.agent.build_dictionary(words_frequencies)
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        A word searched before is answered from the cache.
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        return self._cached(('S', word), self.agent.search)
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        """
+        add a word and its frequency to the dictionary
+        A successful add evicts the cached results it can change.
+        @param word_frequency: (word, frequency) to be added
+        @return: True whether succeeded, False when word is already in the dictionary
+        """
+        added = self.agent.add_word_frequency(word_frequency)
+        if added:
+            self._invalidate(word_frequency.word)
+        return added
+
+    def delete_word(self, word: str) -> bool:
+        """
+        delete a word from the dictionary
+        A successful delete evicts the cached results it can change.
+        @param word: word to be deleted
+        @return: whether succeeded, e.g. return False when point not found
+        """
+        deleted = self.agent.delete_word(word)
+        if deleted:
+            self._invalidate(word)
+        return deleted
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        A successful update evicts the cached results it can change.
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        updated = self.agent.update_frequency(word, frequency)
+        if updated:
+            self._invalidate(word)
+        return updated
+
+    def increment(self, word: str, delta: int) -> int:
+        """
+        add a delta to the frequency of a word, see BaseDictionary.increment()
+        The cached results the word can change are evicted.
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        frequency = self.agent.increment(word, delta)
+        self._invalidate(word)
+        return frequency
+
+    def merge_frequencies(self, pairs):
+        """
+        fold a stream of frequency deltas into the dictionary, as increment() would one pair at a time
+        The cached results every word of the stream can change are evicted.
+        @param pairs: iterable of (word, delta)
+        """
+        pairs = list(pairs)
+        self.agent.merge_frequencies(pairs)
+        for word in {word for word, _ in pairs}:
+            self._invalidate(word)
+
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'prefix_word' as a prefix
+        A prefix whose cached completions reach down to the page asked for is answered from
+        the cache.
+        @param prefix_word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'prefix_word'
+        """
+        key = ('AC', prefix_word)
+        depth = k + offset
+        # the entry is (best completions, whether they are all of them)
+        completions = self.cache.get(key)
+        if completions is not _MISSING and (len(completions[0]) >= depth or completions[1]):
+            self.hits += 1
+            # slicing hands out a copy so callers can't alter the cached list
+            return completions[0][offset:depth]
+        # a miss, or a page deeper than the entry reaches, fetches down to this page
+        self.misses += 1
+        completions = self.agent.autocomplete(prefix_word, depth)
+        self.cache.put(key, (completions, len(completions) < depth))
+
+        return completions[offset:]
+
+    def iter_prefix(self, prefix_word: str):
+        """
+        generate every word in the dictionary that has 'prefix_word' as a prefix, lazily
+        Streamed straight from the wrapped dictionary, there is nothing to cache.
+        @param prefix_word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        return self.agent.iter_prefix(prefix_word)
@@ -0,0 +1,345 @@
+from dictionary.word_frequency import WordFrequency
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.snapshot import read_snapshot, write_snapshot
+from array import array
+import bisect
+import heapq
+
+# ------------------------------------------------------------------------
+# Columnar, array-backed variant of the array-based dictionary
+#
+# Words live in one contiguous buffer of concatenated UTF-8 bytes, addressed
+# by slot through an offsets column, with frequencies in an int64 column.
+# A sorted column of slot numbers plays the role of the sorted array, and
+# WordFrequency objects are only created for the results handed back.
+#
+# A binary search over the slot column would slice a word out of the buffer
+# at every step, in Python. Every FENCE_GAP-th word is therefore also kept as
+# bytes, a fence, with the number of words that sorted below it: a C bisect
+# over the fences narrows a search to one gap, and only that gap is searched
+# slice by slice. An add or delete moves those counts by at most one, so the
+# counts are left as they are and a search widens the gap by the number of
+# changes since; the fences are laid again once that reaches FENCE_GAP.
+#
+# The columns can be saved to a snapshot and mapped back read-only; they are
+# copied into writable arrays on the first add or delete.
+# ------------------------------------------------------------------------
+
+# sorted positions between two fences
+FENCE_GAP = 256
+
+
+class ColumnarArrayDictionary(BaseDictionary):
+
+    def __init__(self):
+        self.buffer = bytearray()           # concatenated UTF-8 words, indexed by slot
+        self.offsets = array('q', [0])      # slot i spans buffer[offsets[i]:offsets[i + 1]]
+        self.frequencies = array('q')       # frequency of slot i, 0 once the slot is deleted
+        self.order = array('q')             # live slots sorted by word
+        self.dead_slots = 0                 # deleted slots still occupying the buffer
+        self.fences = []                    # UTF-8 bytes of every FENCE_GAP-th word, sorted
+        self.fence_positions = array('q')   # number of words sorting below each fence when it was laid
+        self.fence_drift = 0                # adds and deletes since the fences were laid
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        """
+        construct the data structure to store nodes
+        @param words_frequencies: list of (word, frequency) to be stored
+        """
+        words = []
+        frequencies = array('q')
+        for wf_object in words_frequencies:
+            words.append(wf_object.word)
+            frequencies.append(wf_object.frequency)
+        self.build_from_columns(words, frequencies)
+
+    def build_from_columns(self, words: [str], frequencies: array):
+        """
+        construct the data structure straight from columns, e.g. those of loader.load_columns()
+        @param words: list of words to be stored
+        @param frequencies: frequency of each word, in the same order
+        """
+        # 1. encode the words once
+        encoded = [word.encode('utf-8') for word in words]
+        # 2. a single sort over indices, UTF-8 byte order matches code point order
+        permutation = sorted(range(len(encoded)), key=encoded.__getitem__)
+        # 3. lay the columns out in sorted order so slot number == rank
+        self.buffer = bytearray(b''.join([encoded[i] for i in permutation]))
+        self.offsets = array('q', [0])
+        position = 0
+        for i in permutation:
+            position += len(encoded[i])
+            self.offsets.append(position)
+        self.frequencies = array('q', [frequencies[i] for i in permutation])
+        self.order = array('q', range(len(permutation)))
+        self.dead_slots = 0
+        self._build_fences()
+
+    def _word_bytes(self, slot: int):
+        """
+        @param slot: slot number of a word
+        @return: the UTF-8 bytes of the word stored in 'slot'
+        """
+        return bytes(self.buffer[self.offsets[slot]:self.offsets[slot + 1]])
+
+    def _word_frequency(self, slot: int) -> WordFrequency:
+        """
+        @param slot: slot number of a word
+        @return: a WordFrequency view of the word stored in 'slot'
+        """
+        return WordFrequency(self._word_bytes(slot).decode('utf-8'), self.frequencies[slot])
+
+    def _build_fences(self):
+        """
+        lay a fence at every FENCE_GAP-th position of the sorted slot column
+        """
+        positions = range(0, len(self.order), FENCE_GAP)
+        self.fences = [self._word_bytes(self.order[pos]) for pos in positions]
+        self.fence_positions = array('q', positions)
+        self.fence_drift = 0
+
+    def _moved_fences(self):
+        """
+        account for an add or delete, laying the fences again once their counts may be off by a gap
+        """
+        self.fence_drift += 1
+        if self.fence_drift >= FENCE_GAP:
+            self._build_fences()
+
+    def _bisect(self, key: bytes, lo: int = 0) -> int:
+        """
+        binary search the sorted slot column, slicing each probed word out of the buffer once
+        @param key: UTF-8 bytes to be located
+        @param lo: position to start from
+        @return: the first position in self.order whose word doesn't sort below 'key'
+        """
+        buffer, offsets, order = self.buffer, self.offsets, self.order
+        # 1. the fences on either side of the key bound the search, give or take the drift
+        fence = bisect.bisect_right(self.fences, key)
+        if fence:
+            lo = max(lo, self.fence_positions[fence - 1] - self.fence_drift)
+        hi = len(order)
+        if fence < len(self.fences):
+            hi = min(hi, self.fence_positions[fence] + self.fence_drift)
+        # 2. then the words between them
+        # a mapped buffer slices into memoryviews, which don't order, so those are copied out
+        if isinstance(buffer, memoryview):
+            while lo < hi:
+                mid = (lo + hi) >> 1
+                slot = order[mid]
+                if buffer[offsets[slot]:offsets[slot + 1]].tobytes() < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return lo
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            slot = order[mid]
+            if buffer[offsets[slot]:offsets[slot + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def _position_of(self, key: bytes) -> (int, bool):
+        """
+        binary search the sorted slot column
+        @param key: UTF-8 bytes of the word to be located
+        @return: (position in self.order, whether the word is stored there)
+        """
+        pos = self._bisect(key)
+        if pos == len(self.order):
+            return pos, False
+        slot = self.order[pos]
+        found = self.buffer[self.offsets[slot]:self.offsets[slot + 1]] == key
+
+        return pos, found
+
+    def _prefix_range(self, prefix_word: str) -> (int, int):
+        """
+        locate the part of the sorted slot column whose words start with 'prefix_word'
+        @param prefix_word: the prefix to be located
+        @return: (lo, hi) so that self.order[lo:hi] holds every matching slot
+        """
+        key = prefix_word.encode('utf-8')
+        # b'\xff' never occurs in UTF-8, so every match sorts below key + b'\xff'
+        lo = self._bisect(key)
+        hi = self._bisect(key + b'\xff', lo)
+
+        return lo, hi
+
+    def save_snapshot(self, path: str):
+        """
+        write the columns to a snapshot file
+        @param path: the snapshot file to be written
+        """
+        write_snapshot(path, 'columnar', {'buffer': self.buffer, 'offsets': self.offsets,
+                                          'frequencies': self.frequencies, 'order': self.order})
+
+    @classmethod
+    def load_snapshot(cls, path: str):
+        """
+        map a snapshot file and query it in place
+        @param path: the snapshot file to be mapped
+        @return: a dictionary whose columns are read-only views over the mapped file
+        """
+        sections = read_snapshot(path, 'columnar')
+        dictionary = cls()
+        dictionary.buffer = sections['buffer']
+        dictionary.offsets = sections['offsets']
+        dictionary.frequencies = sections['frequencies']
+        dictionary.order = sections['order']
+        dictionary.dead_slots = len(dictionary.frequencies) - len(dictionary.order)
+        dictionary._build_fences()
+
+        return dictionary
+
+    def _make_writable(self):
+        """
+        copy columns mapped from a snapshot into writable arrays
+        """
+        if isinstance(self.order, memoryview):
+            self.buffer = bytearray(self.buffer)
+            self.offsets = array('q', self.offsets.tobytes())
+            self.frequencies = array('q', self.frequencies.tobytes())
+            self.order = array('q', self.order.tobytes())
+
+    def _compact(self):
+        """
+        rewrite the columns without the deleted slots, keeping them in sorted order
+        """
+        words = [self._word_bytes(slot) for slot in self.order]
+        frequencies = [self.frequencies[slot] for slot in self.order]
+        self.buffer = bytearray(b''.join(words))
+        self.offsets = array('q', [0])
+        position = 0
+        for word in words:
+            position += len(word)
+            self.offsets.append(position)
+        self.frequencies = array('q', frequencies)
+        self.order = array('q', range(len(words)))
+        self.dead_slots = 0
+        self._build_fences()
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        pos, found = self._position_of(word.encode('utf-8'))
+        if not found:
+            return 0
+
+        return self.frequencies[self.order[pos]]
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        """
+        add a word and its frequency to the dictionary
+        @param word_frequency: (word, frequency) to be added
+        :return: True whether succeeded, False when word is already in the dictionary
+        """
+        key = word_frequency.word.encode('utf-8')
+        pos, found = self._position_of(key)
+        if found:
+            return False
+        self._make_writable()
+        # 1. append the word to the end of every column as a new slot
+        slot = len(self.frequencies)
+        self.buffer += key
+        self.offsets.append(len(self.buffer))
+        self.frequencies.append(word_frequency.frequency)
+        # 2. insert the slot number at its sorted position
+        self.order.insert(pos, slot)
+        self._moved_fences()
+
+        return True
+
+    def delete_word(self, word: str) -> bool:
+        """
+        delete a word from the dictionary
+        @param word: word to be deleted
+        @return: whether succeeded, e.g. return False when point not found
+        """
+        pos, found = self._position_of(word.encode('utf-8'))
+        if not found:
+            return False
+        self._make_writable()
+        # 1. drop the slot from the sorted column and leave its bytes behind
+        slot = self.order.pop(pos)
+        self._moved_fences()
+        self.frequencies[slot] = 0
+        self.dead_slots += 1
+        # 2. reclaim the buffer once deleted slots outnumber live ones
+        if self.dead_slots > len(self.order):
+            self._compact()
+
+        return True
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        if frequency <= 0:
+            return self.delete_word(word)
+        pos, found = self._position_of(word.encode('utf-8'))
+        if not found:
+            return False
+        self._make_writable()
+        # the slot keeps its place, only the frequency column changes
+        self.frequencies[self.order[pos]] = frequency
+
+        return True
+
+    def increment(self, word: str, delta: int) -> int:
+        """
+        add a delta to the frequency of a word, see BaseDictionary.increment()
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        pos, found = self._position_of(word.encode('utf-8'))
+        if not found:
+            if delta > 0:
+                self.add_word_frequency(WordFrequency(word, delta))
+            return max(delta, 0)
+        frequency = self.frequencies[self.order[pos]] + delta
+        if frequency <= 0:
+            self.delete_word(word)
+            return 0
+        self._make_writable()
+        self.frequencies[self.order[pos]] = frequency
+
+        return frequency
+
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'prefix_word' as a prefix
+        @param prefix_word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'prefix_word'
+        """
+        # 1. matching slots are contiguous in the sorted column
+        lo, hi = self._prefix_range(prefix_word)
+        if self.counters is not None:
+            self.counters['columnar.scanned'] += hi - lo
+        # 2. select on the frequency column and only then materialise the results
+        slots = heapq.nlargest(k + offset, self.order[lo:hi], key=self.frequencies.__getitem__)
+
+        return [self._word_frequency(slot) for slot in slots[offset:]]
+
+    def iter_prefix(self, prefix_word: str):
+        """
+        generate every word in the dictionary that has 'prefix_word' as a prefix, lazily
+        @param prefix_word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        # slot by slot, so only the words actually consumed are decoded
+        lo, hi = self._prefix_range(prefix_word)
+        for pos in range(lo, hi):
+            yield self._word_frequency(self.order[pos])
@@ -0,0 +1,65 @@
+# ------------------------------------------------------------------------
+# Parsing and formatting of the command file format
+#
+#   S <word>               search
+#   A <word> <frequency>   add
+#   D <word>               delete
+#   AC <prefix> [<k>]      autocomplete, the 3 best completions unless k is given
+#   IC <substring> [<k>]   infix search, the 3 most frequent words containing
+#                          the substring unless k is given
+#
+# A parsed command is a tuple: ('S', word), ('A', word, frequency),
+# ('D', word), ('AC', prefix), ('AC', prefix, k), ('IC', substring) or
+# ('IC', substring, k).
+# ------------------------------------------------------------------------
+
+COMMANDS = ('S', 'A', 'D', 'AC', 'IC')
+
+
+def parse_command(line: str) -> tuple:
+    """
+    parse one line of a command file
+    @param line: the line to be parsed
+    @return: the parsed command
+    @raise ValueError: when the line isn't a known command
+    """
+    command_values = line.split()
+    if not command_values or command_values[0] not in COMMANDS:
+        raise ValueError(f'Unknown command: {line.strip()}')
+    if command_values[0] == 'A':
+        return 'A', command_values[1], int(command_values[2])
+    if command_values[0] in ('AC', 'IC') and len(command_values) > 2:
+        k = int(command_values[2])
+        if k < 1:
+            raise ValueError(f'Unknown command: {line.strip()}')
+        return command_values[0], command_values[1], k
+
+    return command_values[0], command_values[1]
+
+
+def format_result(command: tuple, result) -> str:
+    """
+    format the result of a command the way the output file expects it
+    @param command: the parsed command
+    @param result: what the dictionary returned for it
+    @return: the output line, including its newline
+    """
+    word = command[1]
+    # search
+    if command[0] == 'S':
+        if result > 0:
+            return f"Found '{word}' with frequency {result}\n"
+        return f"NOT Found '{word}'\n"
+    # add
+    if command[0] == 'A':
+        return f"Add '{word}' succeeded\n" if result else f"Add '{word}' failed\n"
+    # delete
+    if command[0] == 'D':
+        return f"Delete '{word}' succeeded\n" if result else f"Delete '{word}' failed\n"
+    # autocomplete or infix search
+    line = ("Autocomplete for '" if command[0] == 'AC' else "Infix search for '") + word + "': [ "
+    for item in result:
+        line = line + item.word + ": " + str(item.frequency) + "  "
+
+    return line + ']\n'
+
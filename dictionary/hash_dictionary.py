@@ -0,0 +1,252 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.word_frequency import WordFrequency
+import bisect
+import heapq
+
+# ------------------------------------------------------------------------
+# Hash-table-based dictionary implementation
+#
+# Words live in a dict from word to frequency, so search, add and delete are
+# single hash lookups. Autocomplete is served by secondary structures built
+# with the dictionary and kept up to date by every add, delete and update,
+# so a read never changes anything:
+#
+# - members: for every prefix of 1 to BUCKET_DEPTH letters, the set of words
+#   under it
+# - tops: for every prefix of up to BUCKET_DEPTH letters, the best of its
+#   words as (-frequency, word) in rank order, up to TOP_K of them, so the
+#   top k is a slice. A mutation only touches a list it ranks into, and a
+#   list deletions have worn down below TOP_K // 2 is ranked again from the
+#   members.
+#
+# A longer prefix, or a page reaching below a top list, ranks the members
+# of its first BUCKET_DEPTH letters that start with it. iter_prefix() sorts
+# the members of its prefix.
+# ------------------------------------------------------------------------
+
+# prefixes up to this length get a word set and a ranked top list
+BUCKET_DEPTH = 3
+
+# words kept in rank order per short prefix
+TOP_K = 32
+
+
+class HashDictionary(BaseDictionary):
+
+    def __init__(self):
+        self.frequencies: dict[str, int] = {}       # key = word, value = frequency
+        self.members: dict[str, set] = {}           # key = prefix of 1 to BUCKET_DEPTH letters, value = its words
+        self.tops: dict[str, list] = {'': []}       # key = prefix of 0 to BUCKET_DEPTH letters, value = its best
+                                                    # sorted (-frequency, word)
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        """
+        construct the data structure to store nodes
+        @param words_frequencies: list of (word, frequency) to be stored
+        """
+        # a repeated word keeps the frequency read last
+        for wf_object in words_frequencies:
+            self.frequencies[wf_object.word] = wf_object.frequency
+        # in rank order each prefix's top list is just its first words
+        members = {}
+        tops = {'': []}
+        for entry in sorted((-frequency, word) for word, frequency in self.frequencies.items()):
+            word = entry[1]
+            for length in range(min(len(word), BUCKET_DEPTH) + 1):
+                top = tops.setdefault(word[:length], [])
+                if len(top) < TOP_K:
+                    top.append(entry)
+            for length in range(1, min(len(word), BUCKET_DEPTH) + 1):
+                members.setdefault(word[:length], set()).add(word)
+        self.members = members
+        self.tops = tops
+
+    def _members_of(self, prefix_word: str):
+        """
+        @return: the words under a prefix of up to BUCKET_DEPTH letters
+        """
+        if not prefix_word:
+            return self.frequencies
+        return self.members.get(prefix_word, ())
+
+    def _rank(self, words, depth: int, prefix_word: str = '') -> list:
+        """
+        @return: the best 'depth' of the words starting with 'prefix_word', as sorted (-frequency, word)
+        """
+        if self.counters is not None:
+            self.counters['hashtable.scanned'] += len(words)
+        frequencies = self.frequencies
+        return heapq.nsmallest(depth, ((-frequencies[word], word) for word in words if word.startswith(prefix_word)))
+
+    def _offer(self, word: str, frequency: int):
+        """
+        rank a word, already counted among the members, into the top lists it belongs to
+        """
+        entry = (-frequency, word)
+        for length in range(min(len(word), BUCKET_DEPTH) + 1):
+            top = self.tops[word[:length]]
+            # a list stays the best words of its prefix: it takes the word when it held every
+            # other word of the prefix, or when the word outranks its last one
+            if len(top) == len(self._members_of(word[:length])) - 1 or (top and entry < top[-1]):
+                bisect.insort(top, entry)
+                if len(top) > TOP_K:
+                    top.pop()
+
+    def _withdraw(self, word: str, frequency: int):
+        """
+        take a word out of the top lists holding it
+        """
+        entry = (-frequency, word)
+        for length in range(min(len(word), BUCKET_DEPTH) + 1):
+            top = self.tops.get(word[:length])
+            if top is not None:
+                idx = bisect.bisect_left(top, entry)
+                if idx < len(top) and top[idx] == entry:
+                    del top[idx]
+
+    def _replenish(self, word: str):
+        """
+        rank the top lists of a word's prefixes again once deletions wore them down below TOP_K // 2
+        """
+        for length in range(min(len(word), BUCKET_DEPTH) + 1):
+            top = self.tops.get(word[:length])
+            if top is not None and len(top) < TOP_K // 2:
+                members = self._members_of(word[:length])
+                if len(members) > len(top):
+                    top[:] = self._rank(members, TOP_K)
+
+    def _index_entry(self, word: str, frequency: int):
+        """
+        add a word, already in the frequencies, to the members and the top lists
+        """
+        for length in range(1, min(len(word), BUCKET_DEPTH) + 1):
+            if word[:length] not in self.members:
+                self.members[word[:length]] = set()
+                self.tops[word[:length]] = []
+            self.members[word[:length]].add(word)
+        self._offer(word, frequency)
+
+    def _unindex_entry(self, word: str, frequency: int):
+        """
+        remove a word, already gone from the frequencies, from the members and the top lists
+        """
+        self._withdraw(word, frequency)
+        for length in range(1, min(len(word), BUCKET_DEPTH) + 1):
+            members = self.members[word[:length]]
+            members.discard(word)
+            if not members:
+                del self.members[word[:length]]
+                del self.tops[word[:length]]
+        self._replenish(word)
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        return self.frequencies.get(word, 0)
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        """
+        add a word and its frequency to the dictionary
+        @param word_frequency: (word, frequency) to be added
+        :return: True whether succeeded, False when word is already in the dictionary
+        """
+        if word_frequency.word in self.frequencies:
+            return False
+        self.frequencies[word_frequency.word] = word_frequency.frequency
+        self._index_entry(word_frequency.word, word_frequency.frequency)
+
+        return True
+
+    def delete_word(self, word: str) -> bool:
+        """
+        delete a word from the dictionary
+        @param word: word to be deleted
+        @return: whether succeeded, e.g. return False when point not found
+        """
+        frequency = self.frequencies.pop(word, None)
+        if frequency is None:
+            return False
+        self._unindex_entry(word, frequency)
+
+        return True
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        if frequency <= 0:
+            return self.delete_word(word)
+        old_frequency = self.frequencies.get(word)
+        if old_frequency is None:
+            return False
+        self.frequencies[word] = frequency
+        # only the top lists depend on the frequency
+        if frequency != old_frequency:
+            self._withdraw(word, old_frequency)
+            self._offer(word, frequency)
+            self._replenish(word)
+
+        return True
+
+    def increment(self, word: str, delta: int) -> int:
+        """
+        add a delta to the frequency of a word, see BaseDictionary.increment()
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        frequency = self.frequencies.get(word, 0) + delta
+        if word in self.frequencies:
+            self.update_frequency(word, frequency)
+        elif frequency > 0:
+            self.add_word_frequency(WordFrequency(word, frequency))
+
+        return max(frequency, 0)
+
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'prefix_word' as a prefix
+        @param prefix_word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'prefix_word'
+        """
+        depth = k + offset
+        # 1. a short prefix has its best words ranked already, unless a page reaches deeper
+        if len(prefix_word) <= BUCKET_DEPTH:
+            members = self._members_of(prefix_word)
+            ranked = self.tops.get(prefix_word, [])
+            if len(ranked) < min(depth, len(members)):
+                ranked = self._rank(members, depth)
+        # 2. a longer one picks its words out of the members of its first letters
+        else:
+            ranked = self._rank(self.members.get(prefix_word[:BUCKET_DEPTH], ()), depth, prefix_word)
+
+        return [WordFrequency(word, -negated) for negated, word in ranked[offset:depth]]
+
+    def iter_prefix(self, prefix_word: str):
+        """
+        generate every word in the dictionary that has 'prefix_word' as a prefix
+        A hashtable keeps no order, so the matches are sorted before the first one is handed out.
+        @param prefix_word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        words = self._members_of(prefix_word[:BUCKET_DEPTH])
+        matches = sorted(word for word in words if word.startswith(prefix_word))
+        for word in matches:
+            yield WordFrequency(word, self.frequencies[word])
+
+    def search_many(self, words: [str]) -> [int]:
+        """
+        search for several words
+        @param words: the words to be searched
+        @return: the frequency of each word, 0 if NOT found, in the same order
+        """
+        get = self.frequencies.get
+        return [get(word, 0) for word in words]
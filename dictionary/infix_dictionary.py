@@ -0,0 +1,337 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.word_frequency import WordFrequency
+from collections import defaultdict
+import bisect
+import heapq
+
+# ------------------------------------------------------------------------
+# Infix ("contains") search in front of any dictionary
+#
+# A trigram inverted index maps every three-letter substring to the words
+# containing it. Each word is padded with two end markers before it is cut
+# into trigrams, so every position of the word starts a trigram:
+#
+#   'cat' -> 'cat', 'at\0', 't\0\0'
+#
+# A query of three letters or more is answered by intersecting the posting
+# sets of its trigrams, smallest first, and checking the survivors really
+# contain the query. A query of one or two letters is answered by the union
+# of the posting sets of the trigrams it starts, which is exact. The index
+# keeps its own copy of the frequencies, so ranking never has to go back to
+# the wrapped dictionary.
+#
+# A query matching a large share of the words gains nothing from the index:
+# the words are also kept in rank order, and such a query walks that list
+# from the top, stopping at the k-th word that contains it.
+# ------------------------------------------------------------------------
+
+# length of the indexed substrings
+GRAM = 3
+
+# pads the end of a word so that its last letters start trigrams too
+_END = '\0' * (GRAM - 1)
+
+# a query whose posting sets may hold more than 1 / SCAN_SHARE of the words walks the ranked list instead
+SCAN_SHARE = 64
+
+
+def _rank(word_frequency: (str, int)):
+    # most frequent first, ties broken alphabetically
+    return -word_frequency[1], word_frequency[0]
+
+
+class TrigramIndex:
+    '''
+    Inverted index from trigrams to the words containing them
+    '''
+
+    def __init__(self):
+        self.frequencies: dict[str, int] = {}       # key = indexed word, value = its frequency
+        self.postings: dict[str, set] = {}          # key = trigram, value = words containing it
+        self.starts: dict[str, set] = {}            # key = first 1 or 2 letters of trigrams, value = those trigrams
+        self.ranked: list[tuple[int, str]] = []     # (-frequency, word) of every word, sorted
+
+    def __len__(self):
+        return len(self.frequencies)
+
+    @staticmethod
+    def _grams(word: str) -> set:
+        """
+        @return: the trigrams of 'word' padded with the end markers
+        """
+        padded = word + _END
+        return {padded[i:i + GRAM] for i in range(len(word))}
+
+    def build(self, words_frequencies: [WordFrequency]):
+        """
+        index a batch of words from scratch, a repeated word keeping the frequency read last
+        """
+        self.clear()
+        postings = defaultdict(set)
+        for wf_object in words_frequencies:
+            if wf_object.word not in self.frequencies:
+                padded = wf_object.word + _END
+                for i in range(len(wf_object.word)):
+                    postings[padded[i:i + GRAM]].add(wf_object.word)
+            self.frequencies[wf_object.word] = wf_object.frequency
+        self.postings = dict(postings)
+        for gram in self.postings:
+            for length in range(1, GRAM):
+                self.starts.setdefault(gram[:length], set()).add(gram)
+        self.ranked = sorted((-frequency, word) for word, frequency in self.frequencies.items())
+
+    def _unrank(self, word: str):
+        del self.ranked[bisect.bisect_left(self.ranked, (-self.frequencies[word], word))]
+
+    def add(self, word: str, frequency: int):
+        """
+        index a word, or only update its frequency when it is already indexed
+        """
+        if word in self.frequencies:
+            self._unrank(word)
+            self.frequencies[word] = frequency
+            bisect.insort(self.ranked, (-frequency, word))
+            return
+        self.frequencies[word] = frequency
+        bisect.insort(self.ranked, (-frequency, word))
+        for gram in self._grams(word):
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = set()
+                for length in range(1, GRAM):
+                    self.starts.setdefault(gram[:length], set()).add(gram)
+            posting.add(word)
+
+    def remove(self, word: str) -> bool:
+        """
+        @return: whether the word was indexed
+        """
+        if word not in self.frequencies:
+            return False
+        self._unrank(word)
+        del self.frequencies[word]
+        for gram in self._grams(word):
+            posting = self.postings[gram]
+            posting.discard(word)
+            # drop trigrams no word contains any more, so short queries don't visit them
+            if not posting:
+                del self.postings[gram]
+                for length in range(1, GRAM):
+                    grams = self.starts[gram[:length]]
+                    grams.discard(gram)
+                    if not grams:
+                        del self.starts[gram[:length]]
+        return True
+
+    def set_frequency(self, word: str, frequency: int):
+        """
+        bring a word in line with the dictionary: indexed with 'frequency', or removed when it is 0 or below
+        """
+        if frequency > 0:
+            self.add(word, frequency)
+        else:
+            self.remove(word)
+
+    def clear(self):
+        """
+        remove every word from the index
+        """
+        self.frequencies.clear()
+        self.postings.clear()
+        self.starts.clear()
+        self.ranked.clear()
+
+    def _postings_of(self, substring: str) -> ([set], bool):
+        """
+        @param substring: a non-empty query
+        @return: (posting sets, True if a word must be in all of them or False if in any of them)
+        """
+        # a short query is the start of every trigram at its positions
+        if len(substring) < GRAM:
+            return [self.postings[gram] for gram in self.starts.get(substring, ())], False
+        # a longer one needs all of its trigrams
+        postings = []
+        for i in range(len(substring) - GRAM + 1):
+            posting = self.postings.get(substring[i:i + GRAM])
+            if posting is None:
+                return [], True
+            postings.append(posting)
+
+        return postings, True
+
+    def search(self, substring: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        @param substring: the text the words must contain
+        @param k: number of words wanted
+        @param offset: number of best words to skip first
+        @return: (at most) k most-frequent words containing 'substring', ties broken alphabetically
+        """
+        if not substring:
+            return [WordFrequency(word, -negated) for negated, word in self.ranked[offset:offset + k]]
+        postings, every = self._postings_of(substring)
+        if not postings:
+            return []
+        # 1. a query likely to match many words finds enough of them near the top of the ranked list
+        estimate = min(map(len, postings)) if every else sum(map(len, postings))
+        if estimate * SCAN_SHARE > len(self.ranked):
+            found = []
+            for negated, word in self.ranked:
+                if substring in word:
+                    found.append(WordFrequency(word, -negated))
+                    if len(found) == k + offset:
+                        break
+            return found[offset:]
+        # 2. otherwise combine the posting sets, rarest first so an intersection stays small
+        if every:
+            postings.sort(key=len)
+            # trigrams in the wrong order or apart still pass the intersection
+            words = [word for word in postings[0].intersection(*postings[1:]) if substring in word]
+        else:
+            words = set().union(*postings)
+        ranked = heapq.nsmallest(k + offset, ((word, self.frequencies[word]) for word in words), key=_rank)
+
+        return [WordFrequency(entry[0], entry[1]) for entry in ranked[offset:]]
+
+
+class InfixDictionary(BaseDictionary):
+    '''
+    Keeps a trigram index of the words of a wrapped dictionary to answer infix searches
+    '''
+
+    def __init__(self, agent: BaseDictionary):
+        """
+        @param agent: the dictionary to be wrapped, the words it already holds are indexed at once
+        """
+        self.agent = agent
+        self.index = TrigramIndex()
+        self.index.build(agent.iter_prefix(''))
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        """
+        construct the data structure to store nodes
+        The words are indexed too, a repeated word keeping the frequency read last.
+        @param words_frequencies: list of (word, frequency) to be stored
+        """
+        words_frequencies = list(words_frequencies)
+        self.agent.build_dictionary(words_frequencies)
+        if not len(self.index):
+            self.index.build(words_frequencies)
+            return
+        # a repeated word keeps the frequency read last
+        for wf_object in words_frequencies:
+            self.index.add(wf_object.word, wf_object.frequency)
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        return self.agent.search(word)
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        """
+        add a word and its frequency to the dictionary
+        An added word is indexed too.
+        @param word_frequency: (word, frequency) to be added
+        @return: True whether succeeded, False when word is already in the dictionary
+        """
+        added = self.agent.add_word_frequency(word_frequency)
+        if added:
+            self.index.add(word_frequency.word, word_frequency.frequency)
+        return added
+
+    def delete_word(self, word: str) -> bool:
+        """
+        delete a word from the dictionary
+        A deleted word leaves the index too.
+        @param word: word to be deleted
+        @return: whether succeeded, e.g. return False when point not found
+        """
+        deleted = self.agent.delete_word(word)
+        if deleted:
+            self.index.remove(word)
+        return deleted
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        The index takes the new frequency too.
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        updated = self.agent.update_frequency(word, frequency)
+        if updated:
+            self.index.set_frequency(word, frequency)
+        return updated
+
+    def increment(self, word: str, delta: int) -> int:
+        """
+        add a delta to the frequency of a word, see BaseDictionary.increment()
+        The index takes the new frequency too.
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        frequency = self.agent.increment(word, delta)
+        self.index.set_frequency(word, frequency)
+        return frequency
+
+    def merge_frequencies(self, pairs):
+        """
+        fold a stream of frequency deltas into the dictionary, as increment() would one pair at a time
+        The index takes the final frequency of every word in the stream too.
+        @param pairs: iterable of (word, delta)
+        """
+        pairs = list(pairs)
+        self.agent.merge_frequencies(pairs)
+        # the index mirrors the dictionary, so it can work out the outcome itself
+        net = self._net_frequencies(pairs, lambda word: self.index.frequencies.get(word, 0))
+        for word, frequency in net.items():
+            self.index.set_frequency(word, frequency)
+
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'prefix_word' as a prefix
+        @param prefix_word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'prefix_word'
+        """
+        return self.agent.autocomplete(prefix_word, k, offset)
+
+    def iter_prefix(self, prefix_word: str):
+        """
+        generate every word in the dictionary that has 'prefix_word' as a prefix, lazily
+        @param prefix_word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        return self.agent.iter_prefix(prefix_word)
+
+    def search_many(self, words: [str]) -> [int]:
+        """
+        search for several words
+        @param words: the words to be searched
+        @return: the frequency of each word, 0 if NOT found, in the same order
+        """
+        return self.agent.search_many(words)
+
+    def autocomplete_many(self, prefix_words: [str], k: int = 3) -> [[WordFrequency]]:
+        """
+        autocomplete several prefixes
+        @param prefix_words: the prefixes to be autocompleted
+        @param k: number of words wanted per prefix
+        @return: the autocomplete() list of each prefix, in the same order
+        """
+        return self.agent.autocomplete_many(prefix_words, k)
+
+    def infix_search(self, substring: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that contain 'substring'
+        @param substring: the text to be looked for anywhere in the words
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the matches
+        @return: a list (could be empty) of (at most) k most-frequent words containing 'substring'
+        """
+        return self.index.search(substring, k, offset)
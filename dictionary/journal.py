@@ -0,0 +1,481 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.loader import iter_word_frequencies, load_columns
+from dictionary.word_frequency import WordFrequency
+import os
+import re
+import shutil
+import threading
+
+# ------------------------------------------------------------------------
+# Append-only mutation journal in front of any dictionary
+#
+# A journal directory holds generations of two files:
+#
+#   base-<g>.txt (or .snap)   the words at the start of generation g
+#   journal-<g>.log           the mutations made during generation g
+#
+# Every successful mutation appends one line to the current journal, in the
+# command file format: 'A word frequency', 'D word', or 'U word frequency'
+# for a word whose frequency was set (0 deleting it). Appends are buffered
+# and made durable by commit(), which concurrent callers share: one of them
+# runs the fsync for every record appended so far while the others wait.
+#
+# Recovery loads the newest base and replays the journals from its
+# generation on; a last line without its newline was torn by a crash and is
+# dropped. Compaction starts a new generation, then folds the previous base
+# and journals into the next base in a background thread, working from the
+# files alone, so neither readers nor writers wait for it.
+# ------------------------------------------------------------------------
+
+# records appended between two automatic commits
+BATCH_SIZE = 1024
+
+# records in the current journal that trigger a compaction
+COMPACT_RECORDS = 1 << 16
+
+_FILE_NAME = re.compile(r'(base|journal)-(\d+)\.(txt|snap|log)$')
+
+
+def _sync_directory(directory: str):
+    """
+    make the creation, renaming and removal of files in a directory durable, where the OS allows it
+    """
+    if os.name != 'posix':
+        return
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _read_records(path: str) -> ([tuple], int):
+    """
+    parse a journal file
+    @param path: the journal to be read
+    @return: (the records, the length in bytes of the complete lines)
+    """
+    records = []
+    length = 0
+    with open(path, 'rb') as journal_file:
+        for line in journal_file:
+            # only the last line can lack its newline, when a crash cut it short
+            if not line.endswith(b'\n'):
+                break
+            values = line.decode('utf-8').split()
+            records.append((values[0], values[1], int(values[2])) if len(values) > 2 else (values[0], values[1]))
+            length += len(line)
+
+    return records, length
+
+
+def _apply_record(agent: BaseDictionary, record: tuple):
+    if record[0] == 'A':
+        agent.add_word_frequency(WordFrequency(record[1], record[2]))
+    elif record[0] == 'D':
+        agent.delete_word(record[1])
+    elif not agent.update_frequency(record[1], record[2]) and record[2] > 0:
+        agent.add_word_frequency(WordFrequency(record[1], record[2]))
+
+
+def _fold_record(frequencies: dict, record: tuple):
+    if record[0] == 'D' or record[2] <= 0:
+        frequencies.pop(record[1], None)
+    else:
+        frequencies[record[1]] = record[2]
+
+
+def load_base(agent: BaseDictionary, path: str) -> BaseDictionary:
+    """
+    fill a dictionary from a data file or snapshot, the way dictionary_file_based.py does
+    @param agent: the dictionary to be filled, still empty
+    @param path: the data file, or .snap snapshot
+    @return: the filled dictionary, a new one for a snapshot
+    """
+    if path.endswith('.snap'):
+        return agent.load_snapshot(path)
+    if hasattr(agent, 'build_from_columns'):
+        agent.build_from_columns(*load_columns(path))
+    else:
+        agent.build_dictionary(iter_word_frequencies(path))
+
+    return agent
+
+
+class Journal:
+    '''
+    Append-only file of mutation records with group commit
+    '''
+
+    def __init__(self, path: str, batch_size: int = BATCH_SIZE):
+        """
+        @param path: the journal file, appended to if it exists
+        @param batch_size: records appended between two automatic commits
+        """
+        self.file = open(path, 'a', encoding='utf-8')
+        self.batch_size = batch_size
+        self.condition = threading.Condition()
+        self.appended = 0           # records appended
+        self.synced = 0             # records known to be on disk
+        self.syncing = False        # whether a commit is running its fsync
+
+    def append(self, record: str):
+        """
+        @param record: one line, with its newline
+        """
+        with self.condition:
+            self.file.write(record)
+            self.appended += 1
+            due = self.appended - self.synced >= self.batch_size
+        if due:
+            self.commit()
+
+    def commit(self):
+        """
+        return once every record appended so far is on disk
+        A caller finding an fsync under way waits for it and runs another one only if the
+        records it needs came too late, so concurrent callers share the fsyncs.
+        """
+        with self.condition:
+            target = self.appended
+            while self.synced < target:
+                if self.syncing:
+                    self.condition.wait()
+                    continue
+                self.syncing = True
+                covered = self.appended
+                self.file.flush()
+                # appends carry on while this thread waits for the disk
+                self.condition.release()
+                try:
+                    os.fsync(self.file.fileno())
+                finally:
+                    self.condition.acquire()
+                    self.syncing = False
+                    self.condition.notify_all()
+                self.synced = covered
+
+    def close(self):
+        """
+        commit every record appended so far and close the file
+        """
+        self.commit()
+        self.file.close()
+
+
+class JournaledDictionary(BaseDictionary):
+    '''
+    Records the mutations of a wrapped dictionary in a journal directory, so a restart can recover them
+    '''
+
+    def __init__(self, agent: BaseDictionary, directory: str, generation: int, records: int = 0,
+                 batch_size: int = BATCH_SIZE, compact_records: int = COMPACT_RECORDS):
+        """
+        use recover() to open a journal directory
+        @param agent: the dictionary holding the recovered words
+        @param directory: the journal directory
+        @param generation: the generation being journaled
+        @param records: records already in its journal
+        @param batch_size: records appended between two automatic commits
+        @param compact_records: records in the current journal that trigger a compaction, None for never
+        """
+        self.agent = agent
+        self.directory = directory
+        self.generation = generation
+        self.batch_size = batch_size
+        self.compact_records = compact_records
+        self.journal = Journal(self._path('journal', generation, 'log'), batch_size)
+        self.records = records
+        # mutations take turns, so the journal lists them in the order they were applied
+        self.lock = threading.Lock()
+        self.compactor: threading.Thread = None
+        self.compaction_error: BaseException = None
+
+    @classmethod
+    def recover(cls, agent: BaseDictionary, directory: str, data_filename: str = None, **options):
+        """
+        open a journal directory, bringing the dictionary up to date with it
+        An empty directory starts with a copy of the data file as its first base; after that
+        the directory alone holds the words and 'data_filename' is not read again.
+        @param agent: the dictionary to be filled, still empty
+        @param directory: the journal directory, created if needed
+        @param data_filename: data file, or .snap snapshot, holding the initial words
+        @param options: further arguments of JournaledDictionary()
+        @return: the journaled dictionary
+        """
+        os.makedirs(directory, exist_ok=True)
+        bases, journals = cls._generations(directory)
+        # 1. the first start copies the initial words in
+        if not bases:
+            extension = 'snap' if data_filename and data_filename.endswith('.snap') else 'txt'
+            base = os.path.join(directory, f'base-0.{extension}')
+            if data_filename:
+                shutil.copyfile(data_filename, base + '.tmp')
+            else:
+                open(base + '.tmp', 'w').close()
+            with open(base + '.tmp', 'rb+') as base_file:
+                os.fsync(base_file.fileno())
+            os.replace(base + '.tmp', base)
+            _sync_directory(directory)
+            bases = {0: base}
+        # 2. the newest base, then every journal written since, a compaction may not have caught up with
+        base_generation = max(bases)
+        agent = load_base(agent, bases[base_generation])
+        later = sorted(journal for journal in journals if journal >= base_generation)
+        records = 0
+        for journal in later:
+            path = os.path.join(directory, f'journal-{journal}.log')
+            replayed, length = _read_records(path)
+            for record in replayed:
+                _apply_record(agent, record)
+            records = len(replayed)
+            # 3. appending resumes after the last complete record
+            if length < os.path.getsize(path):
+                os.truncate(path, length)
+
+        return cls(agent, directory, later[-1] if later else base_generation, records, **options)
+
+    @staticmethod
+    def _generations(directory: str) -> (dict, set):
+        """
+        @return: (mapping of generation to its base file, generations with a journal file)
+        """
+        bases = {}
+        journals = set()
+        for name in os.listdir(directory):
+            match = _FILE_NAME.match(name)
+            if match is None:
+                continue
+            if match.group(1) == 'base':
+                bases[int(match.group(2))] = os.path.join(directory, name)
+            else:
+                journals.add(int(match.group(2)))
+
+        return bases, journals
+
+    def _path(self, kind: str, generation: int, extension: str) -> str:
+        return os.path.join(self.directory, f'{kind}-{generation}.{extension}')
+
+    def _log(self, record: str):
+        """
+        append a record, called with the lock held
+        """
+        self.journal.append(record)
+        self.records += 1
+
+    def _after_mutation(self):
+        if self.compact_records is not None and self.records >= self.compact_records:
+            self.compact()
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        """
+        construct the data structure to store nodes
+        Every word is journaled as a U record with its frequency.
+        @param words_frequencies: list of (word, frequency) to be stored
+        """
+        words_frequencies = list(words_frequencies)
+        with self.lock:
+            self.agent.build_dictionary(words_frequencies)
+            for wf_object in words_frequencies:
+                self._log(f'U {wf_object.word} {wf_object.frequency}\n')
+        self._after_mutation()
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        return self.agent.search(word)
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        """
+        add a word and its frequency to the dictionary
+        A successful add is journaled as an A record.
+        @param word_frequency: (word, frequency) to be added
+        @return: True whether succeeded, False when word is already in the dictionary
+        """
+        with self.lock:
+            added = self.agent.add_word_frequency(word_frequency)
+            if added:
+                self._log(f'A {word_frequency.word} {word_frequency.frequency}\n')
+        self._after_mutation()
+        return added
+
+    def delete_word(self, word: str) -> bool:
+        """
+        delete a word from the dictionary
+        A successful delete is journaled as a D record.
+        @param word: word to be deleted
+        @return: whether succeeded, e.g. return False when point not found
+        """
+        with self.lock:
+            deleted = self.agent.delete_word(word)
+            if deleted:
+                self._log(f'D {word}\n')
+        self._after_mutation()
+        return deleted
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        A successful update is journaled as a U record with the new frequency.
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        with self.lock:
+            updated = self.agent.update_frequency(word, frequency)
+            if updated:
+                self._log(f'U {word} {max(frequency, 0)}\n')
+        self._after_mutation()
+        return updated
+
+    def increment(self, word: str, delta: int) -> int:
+        """
+        add a delta to the frequency of a word, see BaseDictionary.increment()
+        The new frequency is journaled as a U record.
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        with self.lock:
+            frequency = self.agent.increment(word, delta)
+            # the outcome, not the delta, so replaying a record twice does no harm
+            self._log(f'U {word} {frequency}\n')
+        self._after_mutation()
+        return frequency
+
+    def merge_frequencies(self, pairs):
+        """
+        fold a stream of frequency deltas into the dictionary, as increment() would one pair at a time
+        The final frequency of every word in the stream is journaled as a U record.
+        @param pairs: iterable of (word, delta)
+        """
+        pairs = list(pairs)
+        with self.lock:
+            net = self._net_frequencies(pairs, self.agent.search)
+            self.agent.merge_frequencies(pairs)
+            for word, frequency in net.items():
+                self._log(f'U {word} {frequency}\n')
+        self._after_mutation()
+
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'prefix_word' as a prefix
+        @param prefix_word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'prefix_word'
+        """
+        return self.agent.autocomplete(prefix_word, k, offset)
+
+    def iter_prefix(self, prefix_word: str):
+        """
+        generate every word in the dictionary that has 'prefix_word' as a prefix, lazily
+        @param prefix_word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        return self.agent.iter_prefix(prefix_word)
+
+    def search_many(self, words: [str]) -> [int]:
+        """
+        search for several words
+        @param words: the words to be searched
+        @return: the frequency of each word, 0 if NOT found, in the same order
+        """
+        return self.agent.search_many(words)
+
+    def autocomplete_many(self, prefix_words: [str], k: int = 3) -> [[WordFrequency]]:
+        """
+        autocomplete several prefixes
+        @param prefix_words: the prefixes to be autocompleted
+        @param k: number of words wanted per prefix
+        @return: the autocomplete() list of each prefix, in the same order
+        """
+        return self.agent.autocomplete_many(prefix_words, k)
+
+    def apply_commands(self, commands: [tuple]) -> list:
+        """
+        run a stream of parsed commands, see BaseDictionary.apply_commands()
+        The mutations of the whole stream are committed together before returning.
+        """
+        results = super().apply_commands(commands)
+        self.commit()
+
+        return results
+
+    def commit(self):
+        """
+        return once every mutation made so far is on disk
+        """
+        self.journal.commit()
+
+    def compact(self, wait: bool = False):
+        """
+        start a new generation and fold the journals so far into its base in the background
+        Nothing happens while a previous compaction is still running.
+        @param wait: return only once the new base is written
+        """
+        with self.lock:
+            if self.compactor is not None and self.compactor.is_alive():
+                return
+            # 1. later mutations go to the journal of the next generation
+            self.journal.close()
+            previous = self.generation
+            self.generation += 1
+            self.journal = Journal(self._path('journal', self.generation, 'log'), self.batch_size)
+            self.records = 0
+            _sync_directory(self.directory)
+            # 2. the base of the new generation is built from the files, apart from the live dictionary
+            self.compactor = threading.Thread(target=self._compact, args=(previous,), name='journal-compactor')
+            self.compactor.start()
+        if wait:
+            self.compactor.join()
+
+    def _compact(self, generation: int):
+        """
+        write the base of generation + 1 from the newest base and the journals up to 'generation'
+        """
+        try:
+            bases, journals = self._generations(self.directory)
+            base_generation = max(base for base in bases if base <= generation)
+            # 1. replay onto a plain mapping of the base words
+            base = bases[base_generation]
+            if base.endswith('.snap'):
+                words_frequencies = type(self.agent).load_snapshot(base).iter_prefix('')
+            else:
+                words_frequencies = iter_word_frequencies(base)
+            frequencies = {wf_object.word: wf_object.frequency for wf_object in words_frequencies}
+            for journal in range(base_generation, generation + 1):
+                if journal in journals:
+                    for record in _read_records(self._path('journal', journal, 'log'))[0]:
+                        _fold_record(frequencies, record)
+            # 2. write it out in the data file format and swap it in
+            path = self._path('base', generation + 1, 'txt')
+            with open(path + '.tmp', 'w', encoding='utf-8') as base_file:
+                base_file.writelines(f'{word}  {frequencies[word]}\n' for word in sorted(frequencies))
+                base_file.flush()
+                os.fsync(base_file.fileno())
+            os.replace(path + '.tmp', path)
+            _sync_directory(self.directory)
+            # 3. the files it replaces are no longer needed
+            for old in bases:
+                if old <= generation:
+                    os.remove(bases[old])
+            for old in journals:
+                if old <= generation:
+                    os.remove(self._path('journal', old, 'log'))
+            _sync_directory(self.directory)
+        except BaseException as error:
+            self.compaction_error = error
+
+    def close(self):
+        """
+        commit the last mutations and wait for a running compaction
+        """
+        if self.compactor is not None:
+            self.compactor.join()
+        self.journal.close()
+        if self.compaction_error is not None:
+            raise self.compaction_error
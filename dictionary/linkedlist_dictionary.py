@@ -1,14 +1,30 @@
 from dictionary.base_dictionary import BaseDictionary
 from dictionary.word_frequency import WordFrequency
+import heapq
 
 class ListNode:
     '''
     Define a node in the linked list
     '''
+    __slots__ = ('word_frequency', 'next', 'prev')
 
     def __init__(self, word_frequency: WordFrequency):
         self.word_frequency = word_frequency
         self.next = None
+        self.prev = None
+
+
+def _rank(word_frequency: WordFrequency):
+    # most frequent first, ties broken alphabetically
+    return -word_frequency.frequency, word_frequency.word
+
+
+# ways of ordering the list:
+#   insertion      newest word first
+#   frequency      sorted by descending frequency, so prefix scans can stop early
+#   move_to_front  a word found by search() moves to the head
+#   transpose      a word found by search() swaps places with its predecessor
+ORDERINGS = ('insertion', 'frequency', 'move_to_front', 'transpose')
 
 # ------------------------------------------------------------------------
 # This class  is required TO BE IMPLEMENTED
@@ -20,41 +36,200 @@ class ListNode:
 
 class LinkedListDictionary(BaseDictionary):
 
-    def __init__(self):
+    def __init__(self, indexed: bool = False, ordering: str = 'insertion'):
+        """
+        @param indexed: keep a hashtable from word to ListNode for constant-time search, add and delete
+        @param ordering: one of ORDERINGS
+        """
+        if ordering not in ORDERINGS:
+            raise ValueError(f"ordering must be one of {', '.join(ORDERINGS)}, not '{ordering}'")
         self.head = ListNode(None)
         self.length = 0
+        self.index: dict[str, ListNode] = {} if indexed else None
+        self.ordering = ordering
 
     def build_dictionary(self, words_frequencies: [WordFrequency]):
         """
         construct the data structure to store nodes
         @param words_frequencies: list of (word, frequency) to be stored
         """
+        if self.ordering == 'frequency':
+            # sort everything once and link it back to front instead of placing each word
+            entries = self._payloads() + list(words_frequencies)
+            if self.index is not None:
+                # a repeated word keeps the frequency read last
+                entries = list({wf_object.word: wf_object for wf_object in entries}.values())
+            entries.sort(key=_rank)
+            self._relink(entries)
+            return
+
         for wf_object in words_frequencies:
-            # 1. create a new ListNode
-            new_node = ListNode(wf_object)
-            if not self.head:
-                self.head = new_node
-            else:
-                # 2. make next of new ListNode as head
-                new_node.next = self.head
-                # 3. move the head to point to new ListNode
-                self.head = new_node
-            self.length += 1
+            # a repeated word keeps the frequency read last when the index can spot it
+            if self.index is not None and wf_object.word in self.index:
+                self.index[wf_object.word].word_frequency = wf_object
+                continue
+            self._push_front(ListNode(wf_object))
 
-    def search(self, word: str) -> int:
+    def _relink(self, entries: [WordFrequency]):
         """
-        search for a word
-        @param word: the word to be searched
-        @return: frequency > 0 if found and 0 if NOT found
+        replace the whole list with new nodes holding the given entries, in the given order
+        @param entries: the (word, frequency) to be stored
+        """
+        self.head = ListNode(None)
+        self.length = 0
+        if self.index is not None:
+            self.index.clear()
+        for wf_object in reversed(entries):
+            self._push_front(ListNode(wf_object))
+
+    def _payloads(self) -> [WordFrequency]:
+        """
+        @return: the stored (word, frequency) in list order
+        """
+        payloads = []
+        current = self.head
+        while current.word_frequency:
+            payloads.append(current.word_frequency)
+            current = current.next
+
+        return payloads
+
+    def _insert_before(self, node: ListNode, new_node: ListNode):
+        """
+        link a node in front of another one
+        @param node: the node that will follow 'new_node', possibly the trailing empty node
+        @param new_node: the node to be linked
+        """
+        new_node.next = node
+        new_node.prev = node.prev
+        if node.prev is None:
+            self.head = new_node
+        else:
+            node.prev.next = new_node
+        node.prev = new_node
+        self.length += 1
+        if self.index is not None:
+            self.index[new_node.word_frequency.word] = new_node
+
+    def _push_front(self, new_node: ListNode):
+        """
+        link a node in as the new head
+        @param new_node: the node to be linked
+        """
+        self._insert_before(self.head, new_node)
+
+    def _link(self, new_node: ListNode):
+        """
+        link a new node where the ordering wants it
+        @param new_node: the node to be linked
+        """
+        if self.ordering != 'frequency':
+            self._push_front(new_node)
+            return
+        # walk past every node that ranks ahead of the new one
+        rank = _rank(new_node.word_frequency)
+        current = self.head
+        visited = 0
+        while current.word_frequency and _rank(current.word_frequency) < rank:
+            current = current.next
+            visited += 1
+        self._insert_before(current, new_node)
+        if self.counters is not None:
+            self.counters['linkedlist.visited'] += visited
+
+    def _unlink(self, node: ListNode):
+        """
+        unlink a node using its predecessor pointer
+        @param node: the node to be removed, never the trailing empty node
+        """
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        node.next.prev = node.prev
+        self.length -= 1
+        if self.index is not None:
+            del self.index[node.word_frequency.word]
+
+    def _find(self, word: str) -> ListNode:
+        """
+        find the node holding a word, through the index or by scanning through list
+        @param word: the word to be found
+        @return: its node, or None if NOT found
         """
+        if self.index is not None:
+            return self.index.get(word)
+
         current = self.head
         for i in range(self.length):
             if current.word_frequency.word == word:
-                return current.word_frequency.frequency
-
+                if self.counters is not None:
+                    self.counters['linkedlist.visited'] += i + 1
+                return current
             current = current.next
+        if self.counters is not None:
+            self.counters['linkedlist.visited'] += self.length
+
+        return None
 
-        return 0
+    def _reorganise(self, node: ListNode):
+        """
+        apply the self-organising heuristic to a node that search() just found
+        @param node: the node that was found
+        """
+        if node.prev is None:
+            return
+        if self.ordering == 'move_to_front':
+            self._unlink(node)
+            self._push_front(node)
+        elif self.ordering == 'transpose':
+            # swapping the payloads is enough to exchange places with the predecessor
+            previous = node.prev
+            previous.word_frequency, node.word_frequency = node.word_frequency, previous.word_frequency
+            if self.index is not None:
+                self.index[previous.word_frequency.word] = previous
+                self.index[node.word_frequency.word] = node
+
+    def _set_frequency(self, node: ListNode, frequency: int):
+        """
+        give a stored word a new frequency, unlinking it once the frequency drops to 0 or below
+        @param node: the node holding the word
+        @param frequency: the new frequency
+        """
+        if frequency <= 0:
+            self._unlink(node)
+            return
+        # a fresh object, the old one may still be held by the caller that added it
+        node.word_frequency = WordFrequency(node.word_frequency.word, frequency)
+        if self.ordering != 'frequency':
+            return
+        # slide the node towards the head or the tail until its neighbours rank around it again
+        rank = _rank(node.word_frequency)
+        target = node
+        while target.prev is not None and _rank(target.prev.word_frequency) > rank:
+            target = target.prev
+        if target is node:
+            target = node.next
+            while target.word_frequency and _rank(target.word_frequency) < rank:
+                target = target.next
+            if target is node.next:
+                return
+        self._unlink(node)
+        self._insert_before(target, node)
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        node = self._find(word)
+        if node is None:
+            return 0
+        frequency = node.word_frequency.frequency
+        self._reorganise(node)
+
+        return frequency
 
     def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
         """
@@ -62,24 +237,13 @@ class LinkedListDictionary(BaseDictionary):
         @param word_frequency: (word, frequency) to be added
         :return: True whether succeeded, False when word is already in the dictionary
         """
-        word_validation = True
-        current = self.head
-        # 1. loop through and check if the word already exists or not
-        for i in range(self.length):
-            if current.word_frequency.word == word_frequency.word:
-                word_validation = False
-            current = current.next
+        # 1. check if the word already exists or not
+        if self._find(word_frequency.word) is not None:
+            return False
         # 2. if the word does not exist, create a new node
-        if word_validation:
-            new_node = ListNode(word_frequency)
-            if not self.head:
-                self.head = new_node
-            else:
-                new_node.next = self.head
-                self.head = new_node
-            self.length += 1
+        self._link(ListNode(word_frequency))
 
-        return word_validation
+        return True
 
     def delete_word(self, word: str) -> bool:
         """ 
@@ -87,53 +251,141 @@ class LinkedListDictionary(BaseDictionary):
         @param word: word to be deleted
         @return: whether succeeded, e.g. return False when point not found
         """
-        # check if linked list has value in case
-        if self.length  == 0:
+        current = self._find(word)
+        if current is None:
             return False
+        # the predecessor pointer makes the unlink constant time
+        self._unlink(current)
 
-        current = self.head
-        previous = None
-        # delete the node if the word is the head node
-        if current.word_frequency.word == word:
-            self.head = current.next
-            self.length -= 1
-            return True
-
-        previous = current
-        current = current.next
-        # delete the node by scanning through list
-        while current.word_frequency:
-            if current.word_frequency.word == word:
-                previous.next = current.next
-                current = None
-                self.length -= 1
-                return True
-            previous = current
-            current = current.next
+        return True
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        Unlike search(), this doesn't count as an access for the self-organising orderings.
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        node = self._find(word)
+        if node is None:
+            return False
+        self._set_frequency(node, frequency)
 
-        return False
+        return True
 
-    def autocomplete(self, word: str) -> [WordFrequency]:
+    def increment(self, word: str, delta: int) -> int:
         """
-        return a list of 3 most-frequent words in the dictionary that have 'word' as a prefix
-        @param word: word to be autocompleted
-        @return: a list (could be empty) of (at most) 3 most-frequent words with prefix 'word'
+        add a delta to the frequency of a word, see BaseDictionary.increment()
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        node = self._find(word)
+        if node is None:
+            if delta > 0:
+                self._link(ListNode(WordFrequency(word, delta)))
+            return max(delta, 0)
+        frequency = node.word_frequency.frequency + delta
+        self._set_frequency(node, frequency)
+
+        return max(frequency, 0)
+
+    def merge_frequencies(self, pairs):
+        """
+        fold a stream of frequency deltas into the dictionary, as increment() would one pair at a time
+        The stored words are found through the index, or else matched against the whole batch in a
+        single walk of the list; in frequency order the nodes whose frequency changed are unlinked
+        and merged back in one more walk.
+        @param pairs: iterable of (word, delta)
         """
-        # check if linked list has value in case
-        if self.length  == 0:
-            return []
+        deltas = {}
+        for word, delta in pairs:
+            deltas.setdefault(word, []).append(delta)
+        # 1. find the node of every word in the batch
+        if self.index is not None:
+            nodes = {word: self.index[word] for word in deltas if word in self.index}
+        else:
+            nodes = {}
+            current = self.head
+            while current.word_frequency:
+                if current.word_frequency.word in deltas:
+                    nodes[current.word_frequency.word] = current
+                current = current.next
+            if self.counters is not None:
+                self.counters['linkedlist.visited'] += self.length
+        # 2. fold each word's deltas and apply the outcome, holding back the nodes that have to move
+        resort = self.ordering == 'frequency'
+        moved = []
+        for word, word_deltas in deltas.items():
+            node = nodes.get(word)
+            frequency = node.word_frequency.frequency if node else 0
+            for delta in word_deltas:
+                frequency = max(frequency + delta, 0)
+            if node is None:
+                if frequency > 0 and resort:
+                    moved.append(ListNode(WordFrequency(word, frequency)))
+                elif frequency > 0:
+                    self._link(ListNode(WordFrequency(word, frequency)))
+            elif frequency <= 0:
+                self._unlink(node)
+            elif frequency != node.word_frequency.frequency:
+                node.word_frequency = WordFrequency(word, frequency)
+                if resort:
+                    self._unlink(node)
+                    moved.append(node)
+        # 3. the rest of the list is still sorted, so the moved nodes are merged in like a sorted list
+        moved.sort(key=lambda node: _rank(node.word_frequency))
+        current = self.head
+        visited = 0
+        for node in moved:
+            rank = _rank(node.word_frequency)
+            while current.word_frequency and _rank(current.word_frequency) < rank:
+                current = current.next
+                visited += 1
+            self._insert_before(current, node)
+        if self.counters is not None:
+            self.counters['linkedlist.visited'] += visited
 
+    def autocomplete(self, word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'word' as a prefix
+        @param word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'word'
+        """
         frequent_words = []
         current = self.head
-        # 1. loop through and check if the word already exists or not
+        # 1. loop through and collect the words starting with the prefix
         for i in range(self.length):
-            if word[0] == current.word_frequency.word[0] and word in current.word_frequency.word:
+            if current.word_frequency.word.startswith(word):
                 frequent_words.append(current.word_frequency)
+                # in frequency order no later node can beat the first k + offset matches
+                if self.ordering == 'frequency' and len(frequent_words) == k + offset:
+                    if self.counters is not None:
+                        self.counters['linkedlist.visited'] += i + 1
+                    return frequent_words[offset:]
+            current = current.next
+        if self.counters is not None:
+            self.counters['linkedlist.visited'] += self.length
+        # 2. extract the k + offset most frequent words with a bounded heap
+        return heapq.nsmallest(k + offset, frequent_words, key=_rank)[offset:]
+
+    def iter_prefix(self, word: str):
+        """
+        generate every word in the dictionary that has 'word' as a prefix
+        No ordering keeps the list alphabetical, so the matches are gathered in one walk
+        and sorted before the first one is handed out.
+        @param word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        matches = []
+        current = self.head
+        while current.word_frequency:
+            if current.word_frequency.word.startswith(word):
+                matches.append(current.word_frequency)
             current = current.next
-        frequent_words.sort(key=lambda x: x.frequency, reverse=True)
-        # 2. extract most three frequent words
-        most_frequent_words = []
-        for frequent_word in frequent_words[:3]:
-            most_frequent_words.append(frequent_word)
+        matches.sort(key=lambda x: x.word)
 
-        return most_frequent_words
+        yield from matches
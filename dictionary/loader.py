@@ -0,0 +1,81 @@
+from dictionary.word_frequency import WordFrequency
+from array import array
+import re
+
+# ------------------------------------------------------------------------
+# Bulk loader for word/frequency data files
+#
+# A data file holds one 'word  frequency' record per line. The file is read
+# in large binary chunks and each chunk is tokenised with a single split(),
+# so the per-record work is one int() call and a share of one bulk decode.
+# The tokens only pair up into records if every line holds two of them, so
+# each chunk is first matched against RECORDS, and split line by line to
+# find the culprit when it doesn't match. Blank lines are skipped.
+# ------------------------------------------------------------------------
+
+# bytes read from the data file at a time
+CHUNK_SIZE = 1 << 20
+
+# lines of two whitespace separated tokens or none, as bytes.split() sees them
+RECORDS = re.compile(rb'(?:[ \t\r\v\f]*(?:\S+[ \t\r\v\f]+\S+[ \t\r\v\f]*)?\n)*')
+
+
+def iter_columns(data_filename: str, chunk_size: int = CHUNK_SIZE):
+    """
+    generate the records of a data file a chunk at a time
+    @param data_filename: the data file to be read
+    @param chunk_size: bytes read from the file at a time
+    @return: generator of (words, frequencies) column pairs, one per chunk
+    """
+    with open(data_filename, 'rb') as data_file:
+        tail = b''
+        line_number = 0
+        while True:
+            chunk = data_file.read(chunk_size)
+            if not chunk:
+                # the last line may have no trailing newline
+                complete, tail = tail, b''
+            else:
+                data = tail + chunk
+                cut = data.rfind(b'\n') + 1
+                complete, tail = data[:cut], data[cut:]
+            if not RECORDS.fullmatch(complete if complete.endswith(b'\n') else complete + b'\n'):
+                for offset, line in enumerate(complete.split(b'\n'), line_number + 1):
+                    if len(line.split()) not in (0, 2):
+                        raise ValueError(f"'{data_filename}' line {offset} doesn't hold exactly a word and a frequency")
+            line_number += complete.count(b'\n')
+            tokens = complete.split()
+            if tokens:
+                # one join/decode/split for the whole chunk instead of a decode per word
+                words = b'\n'.join(tokens[0::2]).decode('utf-8').split('\n')
+                yield words, array('q', map(int, tokens[1::2]))
+            if not chunk:
+                return
+
+
+def load_columns(data_filename: str, chunk_size: int = CHUNK_SIZE) -> ([str], array):
+    """
+    read a whole data file into columns
+    @param data_filename: the data file to be read
+    @param chunk_size: bytes read from the file at a time
+    @return: (list of words, array of frequencies) in file order
+    """
+    words = []
+    frequencies = array('q')
+    for chunk_words, chunk_frequencies in iter_columns(data_filename, chunk_size):
+        words.extend(chunk_words)
+        frequencies.extend(chunk_frequencies)
+
+    return words, frequencies
+
+
+def iter_word_frequencies(data_filename: str, chunk_size: int = CHUNK_SIZE):
+    """
+    stream the records of a data file, e.g. straight into build_dictionary()
+    Only one chunk of records is held in memory at a time.
+    @param data_filename: the data file to be read
+    @param chunk_size: bytes read from the file at a time
+    @return: generator of WordFrequency in file order
+    """
+    for words, frequencies in iter_columns(data_filename, chunk_size):
+        yield from map(WordFrequency, words, frequencies)
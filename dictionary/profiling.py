@@ -0,0 +1,172 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.word_frequency import WordFrequency
+from collections import Counter
+from contextlib import contextmanager
+import heapq
+import json
+import time
+
+# ------------------------------------------------------------------------
+# Opt-in instrumentation of the dictionary operations
+#
+# A Profiler collects per-operation call counts and latency histograms, the
+# duration of named phases (load, build, ...), and the backend counters the
+# implementations add to while a profiler is attached. Nothing here runs
+# unless a dictionary is wrapped in ProfiledDictionary; the backends only
+# test once per call whether their 'counters' attribute is set.
+# ------------------------------------------------------------------------
+
+# number of slowest calls remembered per operation
+SLOWEST_CALLS = 5
+
+
+class OperationStats:
+    '''
+    Call count and latency histogram of one operation
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.histogram = Counter()      # key = upper bound of a power-of-two bucket in microseconds
+        self.slowest = []               # min-heap of the SLOWEST_CALLS slowest (ns, argument)
+
+    def record(self, elapsed_ns: int, argument):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        self.min_ns = elapsed_ns if self.min_ns is None else min(self.min_ns, elapsed_ns)
+        self.max_ns = max(self.max_ns, elapsed_ns)
+        self.histogram[1 << (elapsed_ns // 1000).bit_length()] += 1
+        if len(self.slowest) < SLOWEST_CALLS:
+            heapq.heappush(self.slowest, (elapsed_ns, argument))
+        elif elapsed_ns > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (elapsed_ns, argument))
+
+    def report(self) -> dict:
+        return {'count': self.count,
+                'total_ms': round(self.total_ns / 1e6, 3),
+                'mean_us': round(self.total_ns / self.count / 1e3, 2) if self.count else None,
+                'min_us': round(self.min_ns / 1e3, 2) if self.min_ns is not None else None,
+                'max_us': round(self.max_ns / 1e3, 2),
+                'histogram_us': {f'<{bound}': calls for bound, calls in sorted(self.histogram.items())},
+                'slowest': [{'us': round(elapsed_ns / 1e3, 2), 'argument': argument}
+                            for elapsed_ns, argument in sorted(self.slowest, reverse=True)]}
+
+
+class Profiler:
+    '''
+    Collects operation statistics, phase durations and backend counters
+    '''
+
+    def __init__(self):
+        self.operations: dict[str, OperationStats] = {}
+        self.phases: dict[str, float] = {}
+        self.counters = Counter()
+
+    def record(self, operation: str, elapsed_ns: int, argument=None):
+        if operation not in self.operations:
+            self.operations[operation] = OperationStats()
+        self.operations[operation].record(elapsed_ns, argument)
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        time a named phase of a run, e.g. 'load' or 'build'
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self) -> dict:
+        """
+        @return: a machine-readable report of everything collected
+        """
+        return {'phases_s': {name: round(seconds, 6) for name, seconds in self.phases.items()},
+                'operations': {name: stats.report() for name, stats in self.operations.items()},
+                'counters': dict(self.counters)}
+
+    def write_report(self, path: str):
+        with open(path, 'w') as report_file:
+            json.dump(self.report(), report_file, indent=2)
+            report_file.write('\n')
+
+    def summary(self) -> str:
+        """
+        @return: a human-readable summary of everything collected
+        """
+        lines = ['phase          seconds']
+        for name, seconds in self.phases.items():
+            lines.append(f'{name:<14}{seconds:>8.3f}')
+        lines.append('')
+        lines.append('operation              calls   total ms    mean us     max us  slowest argument')
+        for name, stats in self.operations.items():
+            report = stats.report()
+            slowest = report['slowest'][0]['argument'] if report['slowest'] else ''
+            lines.append(f"{name:<20}{report['count']:>8}{report['total_ms']:>11.3f}{report['mean_us']:>11.2f}"
+                         f"{report['max_us']:>11.2f}  {slowest if slowest is not None else ''}")
+        if self.counters:
+            lines.append('')
+            lines.append('counter                           value')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'{name:<30}{value:>9}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class ProfiledDictionary(BaseDictionary):
+    '''
+    Times every operation of a wrapped dictionary and attaches the profiler's counters to it
+    The counters go to every dictionary down the chain of wrappers (infix, cached, journaled),
+    so the backend doing the work counts into them too. Batches are answered call by call
+    through the base class, so every search and autocomplete is timed with its own argument.
+    '''
+
+    def __init__(self, agent: BaseDictionary, profiler: Profiler = None):
+        self.agent = agent
+        self.profiler = profiler if profiler is not None else Profiler()
+        wrapped = agent
+        while wrapped is not None:
+            wrapped.counters = self.profiler.counters
+            wrapped = getattr(wrapped, 'agent', None)
+
+    def _timed(self, operation: str, method, argument, summary=None):
+        start = time.perf_counter_ns()
+        result = method(argument)
+        self.profiler.record(operation, time.perf_counter_ns() - start, summary if summary is not None else argument)
+
+        return result
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        self._timed('build_dictionary', self.agent.build_dictionary, words_frequencies, '')
+
+    def search(self, word: str) -> int:
+        return self._timed('search', self.agent.search, word)
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        return self._timed('add_word_frequency', self.agent.add_word_frequency, word_frequency, word_frequency.word)
+
+    def delete_word(self, word: str) -> bool:
+        return self._timed('delete_word', self.agent.delete_word, word)
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        return self._timed('update_frequency', lambda argument: self.agent.update_frequency(argument, frequency), word)
+
+    def increment(self, word: str, delta: int) -> int:
+        return self._timed('increment', lambda argument: self.agent.increment(argument, delta), word)
+
+    def merge_frequencies(self, pairs):
+        self._timed('merge_frequencies', self.agent.merge_frequencies, pairs, '')
+
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        return self._timed('autocomplete', lambda argument: self.agent.autocomplete(argument, k, offset), prefix_word)
+
+    def iter_prefix(self, prefix_word: str):
+        # not timed, the work happens as the caller consumes the generator
+        return self.agent.iter_prefix(prefix_word)
+
+    def infix_search(self, substring: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        return self._timed('infix_search', lambda argument: self.agent.infix_search(argument, k, offset), substring)
@@ -0,0 +1,229 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.word_frequency import WordFrequency
+import heapq
+
+# ------------------------------------------------------------------------
+# Compressed (radix / Patricia) trie dictionary implementation
+#
+# Chains of single-child nodes are collapsed into one node whose edge label
+# holds the whole chain, so every hop consumes a run of characters instead
+# of a single letter.
+# ------------------------------------------------------------------------
+
+
+# Class representing a node in the radix trie
+class RadixNode:
+    __slots__ = ('label', 'frequency', 'children')
+
+    def __init__(self, label='', frequency=None):
+        self.label = label              # characters on the edge leading into this node
+        self.frequency = frequency      # frequency of the word ending at this node, None if no word ends here
+        self.children: dict[str, RadixNode] = {}    # key = first letter of the child's label, value = child node
+
+
+def _common_prefix_length(label: str, word: str, start: int) -> int:
+    """
+    @return: length of the longest common prefix of 'label' and word[start:]
+    """
+    length = 0
+    limit = min(len(label), len(word) - start)
+    while length < limit and label[length] == word[start + length]:
+        length += 1
+
+    return length
+
+
+class RadixTrieDictionary(BaseDictionary):
+
+    def __init__(self):
+        self.root = RadixNode()
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        """
+        construct the data structure to store nodes
+        @param words_frequencies: list of (word, frequency) to be stored
+        """
+        for wf_object in words_frequencies:
+            # a repeated word keeps the frequency read last
+            if not self.add_word_frequency(wf_object):
+                self._find(wf_object.word)[-1].frequency = wf_object.frequency
+
+    def _find(self, word: str) -> [RadixNode]:
+        """
+        follow 'word' from the root
+        @param word: the word to be located
+        @return: the nodes on the path, ending at the node of 'word', or None if no node spells it
+        """
+        node = self.root
+        path = [node]
+        i = 0
+        while i < len(word):
+            node = node.children.get(word[i])
+            if node is None or not word.startswith(node.label, i):
+                return None
+            i += len(node.label)
+            path.append(node)
+
+        return path
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        path = self._find(word)
+        if path is None or path[-1].frequency is None:
+            return 0
+
+        return path[-1].frequency
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        """
+        add a word and its frequency to the dictionary
+        @param word_frequency: (word, frequency) to be added
+        :return: True whether succeeded, False when word is already in the dictionary
+        """
+        word = word_frequency.word
+        node = self.root
+        i = 0
+        while i < len(word):
+            child = node.children.get(word[i])
+            # 1. no edge starts with the next letter, hang the rest of the word off this node
+            if child is None:
+                node.children[word[i]] = RadixNode(word[i:], word_frequency.frequency)
+                return True
+            common = _common_prefix_length(child.label, word, i)
+            # 2. the whole edge matches, keep walking
+            if common == len(child.label):
+                node = child
+                i += common
+                continue
+            # 3. the word leaves the edge part way, split it at the divergence point
+            middle = RadixNode(child.label[:common])
+            child.label = child.label[common:]
+            middle.children[child.label[0]] = child
+            node.children[word[i]] = middle
+            if i + common == len(word):
+                middle.frequency = word_frequency.frequency
+            else:
+                middle.children[word[i + common]] = RadixNode(word[i + common:], word_frequency.frequency)
+            return True
+
+        if node.frequency is not None:
+            return False
+        node.frequency = word_frequency.frequency
+
+        return True
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        if frequency <= 0:
+            return self.delete_word(word)
+        path = self._find(word)
+        if path is None or path[-1].frequency is None:
+            return False
+        # the shape of the trie doesn't depend on frequencies
+        path[-1].frequency = frequency
+
+        return True
+
+    def delete_word(self, word: str) -> bool:
+        """
+        delete a word from the dictionary
+        @param word: word to be deleted
+        @return: whether succeeded, e.g. return False when point not found
+        """
+        path = self._find(word)
+        if path is None or path[-1].frequency is None or len(path) == 1:
+            return False
+        node = path[-1]
+        parent = path[-2]
+        node.frequency = None
+        # 1. a leaf is unlinked, after which its parent may be left as a pass-through node
+        if not node.children:
+            del parent.children[node.label[0]]
+            node = parent
+        # 2. merge a pass-through node (no word, one child) with its only child
+        if node is not self.root and node.frequency is None and len(node.children) == 1:
+            child = next(iter(node.children.values()))
+            node.label += child.label
+            node.frequency = child.frequency
+            node.children = child.children
+
+        return True
+
+    def _descend(self, word: str) -> (RadixNode, str):
+        """
+        find the highest node whose subtree holds every word starting with 'word'
+        @param word: the prefix to be followed
+        @return: (the node, the word it spells), or (None, '') if no word starts with 'word'
+        """
+        node = self.root
+        spelled = ''
+        i = 0
+        while i < len(word):
+            node = node.children.get(word[i])
+            if node is None:
+                return None, ''
+            # the prefix may end part way along an edge
+            if node.label.startswith(word[i:]):
+                return node, spelled + node.label
+            if not word.startswith(node.label, i):
+                return None, ''
+            spelled += node.label
+            i += len(node.label)
+
+        return node, spelled
+
+    def autocomplete(self, word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'word' as a prefix
+        @param word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'word'
+        """
+        # 1. descend to the node whose edge covers the end of the prefix
+        node, spelled = self._descend(word)
+        if node is None:
+            return []
+        # 2. collect the words below it with an explicit stack
+        found = []
+        stack = [(node, spelled)]
+        while stack:
+            node, spelled = stack.pop()
+            if node.frequency is not None:
+                found.append((spelled, node.frequency))
+            for child in node.children.values():
+                stack.append((child, spelled + child.label))
+        if self.counters is not None:
+            self.counters['radixtrie.collected'] += len(found)
+        # 3. most frequent first, ties broken alphabetically, with a heap of k + offset
+        most_frequent_words = heapq.nsmallest(k + offset, found, key=lambda x: (-x[1], x[0]))
+
+        return [WordFrequency(entry[0], entry[1]) for entry in most_frequent_words[offset:]]
+
+    def iter_prefix(self, word: str):
+        """
+        generate every word in the dictionary that has 'word' as a prefix, lazily
+        @param word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        node, spelled = self._descend(word)
+        if node is None:
+            return
+        # preorder with the children pushed largest first, so the smallest comes off the stack next
+        stack = [(node, spelled)]
+        while stack:
+            node, spelled = stack.pop()
+            if node.frequency is not None:
+                yield WordFrequency(spelled, node.frequency)
+            for letter in sorted(node.children, reverse=True):
+                child = node.children[letter]
+                stack.append((child, spelled + child.label))
@@ -0,0 +1,313 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.word_frequency import WordFrequency
+from dictionary.trie_dictionary import TrieDictionary
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count, islice
+import heapq
+import os
+import zlib
+
+# ------------------------------------------------------------------------
+# Multi-process sharded dictionary
+#
+# Words are partitioned across worker processes, each owning one shard held
+# by an ordinary single-process backend. Every shard has its own
+# single-worker ProcessPoolExecutor, so a shard always lives in the same
+# process. Commands travel in batches: a batch is split into one sub-stream
+# per shard, in the original order, and each shard runs its sub-stream with
+# one round trip.
+# ------------------------------------------------------------------------
+
+# commands sent to the shards per round trip
+BATCH_SIZE = 10000
+
+PARTITIONS = ('letter', 'hash')
+
+# the shard held by a worker process
+_shard: BaseDictionary = None
+
+# the iter_prefix() generators of the shard being paged through, by cursor id
+_cursors = {}
+
+
+def _init_shard(backend: type):
+    global _shard
+    _shard = backend()
+
+
+def _build_shard(rows: [(str, int)]):
+    _shard.build_dictionary(WordFrequency(word, frequency) for word, frequency in rows)
+
+
+def _call_shard(method: str, *args):
+    return getattr(_shard, method)(*args)
+
+
+def _open_cursor(cursor: int, prefix_word: str, size: int) -> [(str, int)]:
+    # the generator stays alive between pages, so each page resumes where the previous one stopped
+    _cursors[cursor] = _shard.iter_prefix(prefix_word)
+    return _page_shard(cursor, size)
+
+
+def _page_shard(cursor: int, size: int) -> [(str, int)]:
+    # the next matches of a cursor, at most 'size' of them, a short page closing the cursor
+    page = [(item.word, item.frequency) for item in islice(_cursors[cursor], size)]
+    if len(page) < size:
+        del _cursors[cursor]
+    return page
+
+
+def _close_cursor(cursor: int):
+    _cursors.pop(cursor, None)
+
+
+def _run_shard(commands: [tuple]) -> list:
+    # autocomplete and infix results go back as plain tuples, which pickle much smaller
+    results = _shard.apply_commands(commands)
+    return [[(item.word, item.frequency) for item in result] if command[0] in ('AC', 'IC') else result
+            for command, result in zip(commands, results)]
+
+
+class ShardedDictionary(BaseDictionary):
+
+    def __init__(self, shards: int = None, backend: type = TrieDictionary, partition: str = 'letter'):
+        """
+        @param shards: number of worker processes, one per shard, the CPU count by default
+        @param backend: dictionary class holding each shard
+        @param partition: 'letter' to shard by first letter, so an autocomplete goes to one shard,
+                          or 'hash' to spread words evenly, so an autocomplete goes to every shard
+        """
+        if partition not in PARTITIONS:
+            raise ValueError(f"partition must be one of {', '.join(PARTITIONS)}, not '{partition}'")
+        self.partition = partition
+        self.executors = [ProcessPoolExecutor(max_workers=1, initializer=_init_shard, initargs=(backend,))
+                          for _ in range(shards or os.cpu_count() or 1)]
+        self.cursors = count()      # ids of the iter_prefix() cursors opened in the shards
+
+    def close(self):
+        """
+        stop the worker processes
+        """
+        for executor in self.executors:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _shard_of(self, word: str) -> int:
+        """
+        @return: the shard owning 'word'
+        """
+        if self.partition == 'letter':
+            return ord(word[0]) % len(self.executors) if word else 0
+        return zlib.crc32(word.encode('utf-8')) % len(self.executors)
+
+    def _shards_for_prefix(self, prefix_word: str) -> [int]:
+        """
+        @return: the shards that can hold words starting with 'prefix_word'
+        """
+        if self.partition == 'letter' and prefix_word:
+            return [self._shard_of(prefix_word)]
+        return list(range(len(self.executors)))
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        """
+        construct the data structure to store nodes
+        @param words_frequencies: list of (word, frequency) to be stored
+        """
+        rows = [[] for _ in self.executors]
+        for wf_object in words_frequencies:
+            rows[self._shard_of(wf_object.word)].append((wf_object.word, wf_object.frequency))
+        futures = [executor.submit(_build_shard, shard_rows) for executor, shard_rows in zip(self.executors, rows)]
+        for future in futures:
+            future.result()
+
+    def apply_commands(self, commands: [tuple]) -> list:
+        """
+        run a stream of parsed commands (see dictionary.commands) with sequential semantics
+        Each shard sees its own commands in their original order, an AC is sent to every shard
+        that can hold a match and an IC to every shard, so every result equals that of sequential
+        execution. IC needs a backend with infix_search(), see dictionary.infix_dictionary.
+        @param commands: the parsed commands
+        @return: the result of each command, in the same order
+        """
+        results = []
+        for start in range(0, len(commands), BATCH_SIZE):
+            results.extend(self._apply_batch(commands[start:start + BATCH_SIZE]))
+
+        return results
+
+    def _apply_batch(self, commands: [tuple]) -> list:
+        # 1. split the batch into one sub-stream per shard
+        streams = [[] for _ in self.executors]
+        targets = []
+        for command in commands:
+            if command[0] == 'AC':
+                shards = self._shards_for_prefix(command[1])
+            elif command[0] == 'IC':
+                # any shard may hold a word containing the substring
+                shards = list(range(len(self.executors)))
+            else:
+                shards = [self._shard_of(command[1])]
+            for shard in shards:
+                streams[shard].append(command)
+            targets.append(shards)
+        # 2. one round trip per shard, all shards in parallel
+        futures = [executor.submit(_run_shard, stream) if stream else None
+                   for executor, stream in zip(self.executors, streams)]
+        shard_results = [iter(future.result()) if future else None for future in futures]
+        # 3. pick each result back up in order, merging the autocomplete and infix fan-outs
+        results = []
+        for command, shards in zip(commands, targets):
+            if command[0] not in ('AC', 'IC'):
+                results.append(next(shard_results[shards[0]]))
+                continue
+            candidates = [entry for shard in shards for entry in next(shard_results[shard])]
+            k = command[2] if len(command) > 2 else 3
+            results.append([WordFrequency(word, frequency)
+                            for word, frequency in heapq.nsmallest(k, candidates, key=lambda x: (-x[1], x[0]))])
+
+        return results
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        The shard owning the word answers it.
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        return self.apply_commands([('S', word)])[0]
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        """
+        add a word and its frequency to the dictionary
+        The shard owning the word stores it.
+        @param word_frequency: (word, frequency) to be added
+        @return: True whether succeeded, False when word is already in the dictionary
+        """
+        return self.apply_commands([('A', word_frequency.word, word_frequency.frequency)])[0]
+
+    def delete_word(self, word: str) -> bool:
+        """
+        delete a word from the dictionary
+        The shard owning the word deletes it.
+        @param word: word to be deleted
+        @return: whether succeeded, e.g. return False when point not found
+        """
+        return self.apply_commands([('D', word)])[0]
+
+    def autocomplete(self, prefix_word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'prefix_word' as a prefix
+        A shard can't know which of its words the others outrank, so every shard that can hold
+        a match sends its best k + offset and the best of those are kept.
+        @param prefix_word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'prefix_word'
+        """
+        return self.apply_commands([('AC', prefix_word, k + offset)])[0][offset:]
+
+    def infix_search(self, substring: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that contain 'substring'
+        Any shard may hold a match, so every shard sends its best k + offset and the best of
+        those are kept. The backend of the shards has to provide infix_search() itself.
+        @param substring: the text to be looked for anywhere in the words
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the matches
+        @return: a list (could be empty) of (at most) k most-frequent words containing 'substring'
+        """
+        return self.apply_commands([('IC', substring, k + offset)])[0][offset:]
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        The shard owning the word updates it.
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        return self.executors[self._shard_of(word)].submit(_call_shard, 'update_frequency', word, frequency).result()
+
+    def increment(self, word: str, delta: int) -> int:
+        """
+        add a delta to the frequency of a word, see BaseDictionary.increment()
+        The shard owning the word updates it.
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        return self.executors[self._shard_of(word)].submit(_call_shard, 'increment', word, delta).result()
+
+    def merge_frequencies(self, pairs):
+        """
+        fold a stream of frequency deltas into the dictionary, as increment() would one pair at a time
+        Each shard folds in its own pairs, in their original order, all shards in parallel.
+        @param pairs: iterable of (word, delta)
+        """
+        shard_pairs = [[] for _ in self.executors]
+        for word, delta in pairs:
+            shard_pairs[self._shard_of(word)].append((word, delta))
+        futures = [executor.submit(_call_shard, 'merge_frequencies', stream)
+                   for executor, stream in zip(self.executors, shard_pairs) if stream]
+        for future in futures:
+            future.result()
+
+    def iter_prefix(self, prefix_word: str):
+        """
+        generate every word in the dictionary that has 'prefix_word' as a prefix, lazily
+        Each shard keeps a generator of its matches open under a cursor and hands them over in
+        pages of BATCH_SIZE, the next page being fetched while the current one is consumed, and
+        the sorted pages are merged across shards.
+        @param prefix_word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        # the first page of every shard is requested at once
+        streams = []
+        for shard in self._shards_for_prefix(prefix_word):
+            cursor = next(self.cursors)
+            first_page = self.executors[shard].submit(_open_cursor, cursor, prefix_word, BATCH_SIZE)
+            streams.append(self._iter_shard_prefix(shard, cursor, first_page))
+        # a word lives in one shard only, so the merge never compares two equal words
+        for word, frequency in heapq.merge(*streams):
+            yield WordFrequency(word, frequency)
+
+    def _iter_shard_prefix(self, shard: int, cursor: int, first_page):
+        page = first_page.result()
+        try:
+            while len(page) == BATCH_SIZE:
+                following = self.executors[shard].submit(_page_shard, cursor, BATCH_SIZE)
+                yield from page
+                page = following.result()
+            yield from page
+        finally:
+            # a caller stopping early leaves the cursor open in the shard
+            if len(page) == BATCH_SIZE:
+                try:
+                    self.executors[shard].submit(_close_cursor, cursor)
+                except RuntimeError:
+                    # the dictionary was closed first, taking the shard with it
+                    pass
+
+    def search_many(self, words: [str]) -> [int]:
+        """
+        search for several words
+        The words go to their shards as one batch, see apply_commands().
+        @param words: the words to be searched
+        @return: the frequency of each word, 0 if NOT found, in the same order
+        """
+        return self.apply_commands([('S', word) for word in words])
+
+    def autocomplete_many(self, prefix_words: [str], k: int = 3) -> [[WordFrequency]]:
+        """
+        autocomplete several prefixes
+        The prefixes go to their shards as one batch, see apply_commands().
+        @param prefix_words: the prefixes to be autocompleted
+        @param k: number of words wanted per prefix
+        @return: the autocomplete() list of each prefix, in the same order
+        """
+        return self.apply_commands([('AC', prefix_word, k) for prefix_word in prefix_words])
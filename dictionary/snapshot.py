@@ -0,0 +1,109 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# ------------------------------------------------------------------------
+# Versioned binary snapshots of the array-encoded dictionaries
+#
+# Layout: a fixed header (magic, format version, manifest length), a JSON
+# manifest naming the backend kind and the byte order of the machine that
+# wrote it and giving each section's typecode, file offset and item count,
+# then the raw sections, each aligned to 8 bytes. The sections are in native
+# byte order, so a snapshot only loads on a machine of the same byte order.
+# Loading maps the file and returns memoryviews straight into the mapping,
+# so nothing is deserialised and queries read the pages on demand.
+# ------------------------------------------------------------------------
+
+MAGIC = b'DICTSNAP'
+VERSION = 2
+_HEADER = struct.Struct('<8sII')
+_ALIGNMENT = 8
+
+
+def _aligned(position: int) -> int:
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def write_snapshot(path: str, kind: str, sections: dict):
+    """
+    write a snapshot file, replacing 'path' atomically
+    @param path: the snapshot file to be written
+    @param kind: name of the backend the sections belong to
+    @param sections: mapping of section name to an array, a bytes-like object or a memoryview of either
+    """
+    # 1. lay out the manifest, it is rewritten until its own length settles
+    views = {name: memoryview(data) for name, data in sections.items()}
+    blobs = {name: view.cast('B') for name, view in views.items()}
+    manifest = {}
+    encoded = b''
+    while True:
+        position = _aligned(_HEADER.size + len(encoded))
+        layout = {}
+        for name, view in views.items():
+            layout[name] = [view.format, position, len(view)]
+            position = _aligned(position + len(blobs[name]))
+        manifest = {'kind': kind, 'byteorder': sys.byteorder, 'sections': layout}
+        candidate = json.dumps(manifest).encode('utf-8')
+        if len(candidate) == len(encoded):
+            break
+        encoded = candidate
+    # 2. write the header, manifest and sections to a temporary file and swap it in
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as snapshot_file:
+        snapshot_file.write(_HEADER.pack(MAGIC, VERSION, len(encoded)))
+        snapshot_file.write(encoded)
+        for name, blob in blobs.items():
+            snapshot_file.seek(manifest['sections'][name][1])
+            snapshot_file.write(blob)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary, path)
+
+
+def read_snapshot(path: str, kind: str) -> dict:
+    """
+    map a snapshot file into memory
+    @param path: the snapshot file to be read
+    @param kind: name of the backend expected in the snapshot
+    @return: mapping of section name to a read-only memoryview over the mapped file
+    """
+    with open(path, 'rb') as snapshot_file:
+        mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, version, manifest_length = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"'{path}' is not a dictionary snapshot")
+    if version != VERSION:
+        raise ValueError(f"'{path}' has snapshot version {version}, expected {VERSION}")
+    manifest = json.loads(bytes(view[_HEADER.size:_HEADER.size + manifest_length]))
+    if manifest['kind'] != kind:
+        raise ValueError(f"'{path}' holds a '{manifest['kind']}' snapshot, expected '{kind}'")
+    if manifest['byteorder'] != sys.byteorder:
+        raise ValueError(f"'{path}' was written {manifest['byteorder']}-endian, this machine is {sys.byteorder}-endian")
+
+    sections = {}
+    for name, (typecode, offset, count) in manifest['sections'].items():
+        size = count * array(typecode).itemsize
+        sections[name] = view[offset:offset + size].cast(typecode)
+
+    return sections
+
+
+if __name__ == '__main__':
+    from dictionary.columnar_array_dictionary import ColumnarArrayDictionary
+    from dictionary.static_trie_dictionary import StaticTrieDictionary
+    from dictionary.loader import iter_word_frequencies
+
+    # python -m dictionary.snapshot <columnar | statictrie> <data fileName> <snapshot fileName>
+    snapshot_backends = {'columnar': ColumnarArrayDictionary, 'statictrie': StaticTrieDictionary}
+    if len(sys.argv) != 4 or sys.argv[1] not in snapshot_backends:
+        print('python3 -m dictionary.snapshot', '<approach> <data fileName> <snapshot fileName>')
+        print('<approach> = <' + ' | '.join(snapshot_backends) + '>')
+        sys.exit(1)
+
+    agent = snapshot_backends[sys.argv[1]]()
+    agent.build_dictionary(iter_word_frequencies(sys.argv[2]))
+    agent.save_snapshot(sys.argv[3])
@@ -0,0 +1,299 @@
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.word_frequency import WordFrequency
+from dictionary.snapshot import read_snapshot, write_snapshot
+from array import array
+import heapq
+
+# ------------------------------------------------------------------------
+# Static, array-encoded trie dictionary implementation
+#
+# The trie is built once from the sorted words and frozen into flat integer
+# arrays indexed by node number (first-child / next-sibling encoding), so no
+# per-node Python objects exist. Node 0 is the root and the nodes are
+# numbered in preorder, which keeps siblings in alphabetical order.
+#
+# Mutations go to a small overlay (added words and deleted words) that is
+# consulted on every query and folded back into the arrays by merge().
+# The arrays can be saved to a snapshot and mapped back read-only, since
+# they are never written in place.
+# ------------------------------------------------------------------------
+
+# overlay size that triggers an automatic merge
+OVERLAY_LIMIT = 4096
+
+
+class StaticTrieDictionary(BaseDictionary):
+
+    def __init__(self, overlay_limit: int = OVERLAY_LIMIT):
+        self.letters = array('q', [0])          # code point of the letter on the edge into each node
+        self.first_child = array('q', [-1])     # first (smallest) child of each node, -1 if none
+        self.next_sibling = array('q', [-1])    # next larger sibling of each node, -1 if none
+        self.frequencies = array('q', [0])      # frequency of the word ending at each node, 0 if none
+        self.max_frequencies = array('q', [0])  # largest frequency anywhere in each node's subtree
+        self.added = {}                         # overlay: words added since the last merge
+        self.deleted = set()                    # overlay: frozen words deleted since the last merge
+        self.overlay_limit = overlay_limit
+
+    def build_dictionary(self, words_frequencies: [WordFrequency]):
+        """
+        construct the data structure to store nodes
+        @param words_frequencies: list of (word, frequency) to be stored
+        """
+        # a repeated word keeps the frequency read last
+        self._freeze({wf_object.word: wf_object.frequency for wf_object in words_frequencies})
+
+    def _freeze(self, frequency_of: dict):
+        """
+        encode the given words into fresh arrays and clear the overlay
+        @param frequency_of: mapping of every word to be stored to its frequency
+        """
+        letters = array('q', [0])
+        first_child = array('q', [-1])
+        next_sibling = array('q', [-1])
+        frequencies = array('q', [0])
+        parents = array('q', [-1])
+        last_child = array('q', [-1])
+        # 1. insert the words in sorted order, reusing the common prefix with the previous word
+        path = [0]
+        previous = ''
+        for word in sorted(frequency_of):
+            common = 0
+            limit = min(len(word), len(previous))
+            while common < limit and word[common] == previous[common]:
+                common += 1
+            del path[common + 1:]
+            for char in word[common:]:
+                parent = path[-1]
+                node = len(letters)
+                letters.append(ord(char))
+                first_child.append(-1)
+                next_sibling.append(-1)
+                frequencies.append(0)
+                parents.append(parent)
+                last_child.append(-1)
+                if last_child[parent] == -1:
+                    first_child[parent] = node
+                else:
+                    next_sibling[last_child[parent]] = node
+                last_child[parent] = node
+                path.append(node)
+            frequencies[path[-1]] = frequency_of[word]
+            previous = word
+        # 2. children are numbered after their parent, so one backward pass settles the subtree maxima
+        max_frequencies = array('q', frequencies)
+        for node in range(len(letters) - 1, 0, -1):
+            parent = parents[node]
+            if max_frequencies[node] > max_frequencies[parent]:
+                max_frequencies[parent] = max_frequencies[node]
+
+        self.letters = letters
+        self.first_child = first_child
+        self.next_sibling = next_sibling
+        self.frequencies = frequencies
+        self.max_frequencies = max_frequencies
+        self.added = {}
+        self.deleted = set()
+
+    def _locate(self, word: str) -> int:
+        """
+        follow 'word' from the root through the sibling lists
+        @param word: the word (or prefix) to be located
+        @return: the node spelling 'word', or -1 if there is none
+        """
+        node = 0
+        for char in word:
+            code = ord(char)
+            child = self.first_child[node]
+            # siblings are sorted, so stop as soon as the letter is passed
+            while child != -1 and self.letters[child] < code:
+                child = self.next_sibling[child]
+            if child == -1 or self.letters[child] != code:
+                return -1
+            node = child
+
+        return node
+
+    def _iter_frozen_words(self, node: int, prefix: str):
+        """
+        generate the frozen (word, frequency) pairs below a node in alphabetical order
+        @param node: the node spelling 'prefix'
+        @param prefix: the word spelled by 'node'
+        """
+        stack = [(node, prefix)]
+        while stack:
+            node, word = stack.pop()
+            if self.frequencies[node] > 0:
+                yield word, self.frequencies[node]
+            children = []
+            child = self.first_child[node]
+            while child != -1:
+                children.append((child, word + chr(self.letters[child])))
+                child = self.next_sibling[child]
+            stack.extend(reversed(children))
+
+    def _iter_frozen_ranked(self, node: int, prefix: str):
+        """
+        generate the frozen (word, frequency) pairs below a node, most frequent first
+        Best-first search keyed on the subtree maxima, so only the frontier is expanded.
+        @param node: the node spelling 'prefix'
+        @param prefix: the word spelled by 'node'
+        """
+        # entries are (-frequency, word, kind, node); kind 0 is a finished word, kind 1 a subtree
+        heap = [(-self.max_frequencies[node], prefix, 1, node)]
+        while heap:
+            negative_frequency, word, kind, node = heapq.heappop(heap)
+            if kind == 0:
+                yield word, -negative_frequency
+                continue
+            if self.frequencies[node] > 0:
+                heapq.heappush(heap, (-self.frequencies[node], word, 0, node))
+            child = self.first_child[node]
+            while child != -1:
+                heapq.heappush(heap, (-self.max_frequencies[child], word + chr(self.letters[child]), 1, child))
+                child = self.next_sibling[child]
+
+    def merge(self):
+        """
+        fold the overlay back into freshly encoded arrays
+        """
+        frequency_of = {word: frequency for word, frequency in self._iter_frozen_words(0, '')
+                        if word not in self.deleted}
+        frequency_of.update(self.added)
+        self._freeze(frequency_of)
+
+    def save_snapshot(self, path: str):
+        """
+        merge the overlay and write the node arrays to a snapshot file
+        @param path: the snapshot file to be written
+        """
+        if self.added or self.deleted:
+            self.merge()
+        write_snapshot(path, 'statictrie', {'letters': self.letters, 'first_child': self.first_child,
+                                            'next_sibling': self.next_sibling, 'frequencies': self.frequencies,
+                                            'max_frequencies': self.max_frequencies})
+
+    @classmethod
+    def load_snapshot(cls, path: str, overlay_limit: int = OVERLAY_LIMIT):
+        """
+        map a snapshot file and query it in place
+        @param path: the snapshot file to be mapped
+        @param overlay_limit: overlay size that triggers an automatic merge
+        @return: a dictionary whose node arrays are read-only views over the mapped file
+        """
+        sections = read_snapshot(path, 'statictrie')
+        dictionary = cls(overlay_limit)
+        dictionary.letters = sections['letters']
+        dictionary.first_child = sections['first_child']
+        dictionary.next_sibling = sections['next_sibling']
+        dictionary.frequencies = sections['frequencies']
+        dictionary.max_frequencies = sections['max_frequencies']
+
+        return dictionary
+
+    def _overlay_changed(self):
+        if len(self.added) + len(self.deleted) > self.overlay_limit:
+            self.merge()
+
+    def search(self, word: str) -> int:
+        """
+        search for a word
+        @param word: the word to be searched
+        @return: frequency > 0 if found and 0 if NOT found
+        """
+        if word in self.added:
+            return self.added[word]
+        if word in self.deleted:
+            return 0
+        node = self._locate(word)
+        if node == -1:
+            return 0
+
+        return self.frequencies[node]
+
+    def add_word_frequency(self, word_frequency: WordFrequency) -> bool:
+        """
+        add a word and its frequency to the dictionary
+        @param word_frequency: (word, frequency) to be added
+        :return: True whether succeeded, False when word is already in the dictionary
+        """
+        if self.search(word_frequency.word) > 0:
+            return False
+        # a deleted frozen word stays in 'deleted' so its old frequency remains hidden
+        self.added[word_frequency.word] = word_frequency.frequency
+        self._overlay_changed()
+
+        return True
+
+    def delete_word(self, word: str) -> bool:
+        """
+        delete a word from the dictionary
+        @param word: word to be deleted
+        @return: whether succeeded, e.g. return False when point not found
+        """
+        if word in self.added:
+            del self.added[word]
+            return True
+        if self.search(word) == 0:
+            return False
+        self.deleted.add(word)
+        self._overlay_changed()
+
+        return True
+
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        if frequency <= 0:
+            return self.delete_word(word)
+        if self.search(word) == 0:
+            return False
+        # a frozen word moves to the overlay, its frozen entry hidden the same way a deletion hides it
+        if word not in self.added:
+            self.deleted.add(word)
+        self.added[word] = frequency
+        self._overlay_changed()
+
+        return True
+
+    def autocomplete(self, word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'word' as a prefix
+        @param word: word to be autocompleted
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'word'
+        """
+        # 1. the first k + offset frozen words still alive are the best the arrays can offer
+        candidates = []
+        node = self._locate(word)
+        if node != -1:
+            for entry in self._iter_frozen_ranked(node, word):
+                if entry[0] not in self.deleted:
+                    candidates.append(entry)
+                    if len(candidates) == k + offset:
+                        break
+        # 2. the overlay is small, so scan it for words added under the prefix
+        candidates.extend(entry for entry in self.added.items() if entry[0].startswith(word))
+        candidates.sort(key=lambda x: (-x[1], x[0]))
+
+        return [WordFrequency(entry[0], entry[1]) for entry in candidates[offset:offset + k]]
+
+    def iter_prefix(self, word: str):
+        """
+        generate every word in the dictionary that has 'word' as a prefix, lazily
+        @param word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        # 1. the frozen words still alive, in the preorder of the arrays
+        frozen = ()
+        node = self._locate(word)
+        if node != -1:
+            frozen = (entry for entry in self._iter_frozen_words(node, word) if entry[0] not in self.deleted)
+        # 2. the overlay is small, so its matches are sorted up front and merged in
+        added = sorted(entry for entry in self.added.items() if entry[0].startswith(word))
+        for entry in heapq.merge(frozen, added):
+            yield WordFrequency(entry[0], entry[1])
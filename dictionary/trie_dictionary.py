@@ -1,6 +1,11 @@
 from dictionary.base_dictionary import BaseDictionary
 from dictionary.word_frequency import WordFrequency
+from contextlib import nullcontext
+from itertools import islice
+import gc
+import heapq
 import string
+import threading
 # ------------------------------------------------------------------------
 # This class is required TO BE IMPLEMENTED
 # Trie-based dictionary implementation
@@ -9,6 +14,24 @@ import string
 # __copyright__ = 'Copyright 2022, RMIT University'
 # ------------------------------------------------------------------------
 
+# number of completions cached at every node
+TOP_K = 3
+
+# words added by a bulk build between two gc.freeze() calls
+FREEZE_WORDS = 10000
+
+# Copy-on-write mode (TrieDictionary(copy_on_write=True)) lets any number of
+# threads search and autocomplete while one thread at a time adds or deletes.
+# A writer never changes a node a reader can reach: it clones the nodes on
+# the path of the word, changes the clones and publishes them by swapping
+# self.root in a single assignment. A reader takes self.root once and so sees
+# one consistent version of the whole trie for the length of its call.
+
+
+def _rank(entry):
+    # most frequent first, ties broken alphabetically
+    return -entry[1], entry[0]
+
 
 # Class representing a node in the Trie
 class TrieNode:
@@ -18,34 +41,194 @@ class TrieNode:
         self.frequency = frequency      # frequency of the word if this letter is the end of a word
         self.is_last = is_last          # True if this letter is the end of a word
         self.children: dict[str, TrieNode] = {}     # a hashtable containing children nodes, key = letter, value = child node
+        self.top: list[tuple[str, int]] = []        # TOP_K most frequent (word, frequency) in this subtree, best first
+
+    def clone(self):
+        """
+        @return: a copy of this node sharing its children, but with its own children dict and cache
+        """
+        node = TrieNode(self.letter, self.frequency, self.is_last)
+        node.children = dict(self.children)
+        node.top = list(self.top)
+        return node
 
 class TrieDictionary(BaseDictionary):
 
-    def __init__(self):
+    def __init__(self, copy_on_write: bool = False):
+        """
+        @param copy_on_write: True to let readers in other threads run alongside a writer
+        """
         self.root = TrieNode()
+        self.copy_on_write = copy_on_write
+        # writers take turns; readers never take a lock
+        # reentrant, as increment() holds it across the update_frequency() or add_word_frequency() it calls
+        self.writer_lock = threading.RLock() if copy_on_write else nullcontext()
+
+    def snapshot(self) -> 'TrieDictionary':
+        """
+        @return: a dictionary frozen at the current contents, unaffected by later changes to this one
+        """
+        if not self.copy_on_write:
+            raise ValueError('snapshot() needs a copy-on-write TrieDictionary')
+        frozen = TrieDictionary(copy_on_write=True)
+        frozen.root = self.root
+
+        return frozen
 
     def build_dictionary(self, words_frequencies: [WordFrequency]):
         """
         construct the data structure to store nodes
+        The words are merged into the ones already stored, a repeated word keeping the frequency
+        read last. In copy-on-write mode they are merged into clones, published all at once.
         @param words_frequencies: list of (word, frequency) to be stored
         """
+        with self.writer_lock:
+            root = self.root.clone() if self.copy_on_write else self.root
+            self._build(root, words_frequencies)
+            self.root = root
+
+    def _build(self, root, words_frequencies: [WordFrequency]):
+        # an empty trie is built in one pass over the sorted words
+        if not root.children and not root.is_last:
+            self._bulk_build(root, words_frequencies)
+            return
+        # the nodes on the paths of the words, in copy-on-write mode clones of those readers can reach
+        touched = {id(root)}
         for wf_object in words_frequencies:
-            node = self.root
+            node = root
             for char in wf_object.word:
-                found_in_child = False
-                for child in node.children:
-                    if char == child:
-                        node = node.children[char] #set its value TrieNode
-                        found_in_child = True
-                        break
-                if not found_in_child:
-                    new_node = TrieNode(char, None, False)
-                    node.children[char] = new_node
-                    node = new_node
+                child = node.children.get(char)
+                if child is None or id(child) not in touched:
+                    if child is None:
+                        child = TrieNode(char, None, False)
+                    elif self.copy_on_write:
+                        child = child.clone()
+                    node.children[char] = child
+                    touched.add(id(child))
+                node = child
 
             node.frequency = wf_object.frequency
             node.is_last = True
 
+        self._refresh_subtree(root, touched)
+
+    def _bulk_build(self, root, words_frequencies: [WordFrequency]):
+        """
+        fill an empty trie from scratch
+        In sorted order a word shares its longest common prefix with the word before it, so
+        the path of the previous word is reused down to there and only the rest is created.
+        The nodes left behind have seen their whole subtree, so their caches are filled then.
+        @param root: the empty root
+        @param words_frequencies: list of (word, frequency) to be stored, in any order
+        """
+        # a repeated word keeps the frequency read last
+        frequencies = {wf_object.word: wf_object.frequency for wf_object in words_frequencies}
+        path = [root]       # nodes spelling the previous word, path[i] spelling previous[:i]
+        previous = ''
+        # only new nodes are allocated, none freed, so a collection would just walk the growing trie:
+        # what is built so far is moved out of the collector's reach every FREEZE_WORDS words
+        for count, word in enumerate(sorted(frequencies)):
+            if count % FREEZE_WORDS == 0:
+                gc.freeze()
+            # 1. length of the prefix shared with the previous word
+            common = 0
+            limit = min(len(word), len(previous))
+            while common < limit and word[common] == previous[common]:
+                common += 1
+            # 2. the deeper nodes of the previous word are complete
+            while len(path) > common + 1:
+                self._close_node(path.pop(), previous[:len(path)])
+            # 3. the rest of the word hangs below them
+            node = path[-1]
+            for char in word[common:]:
+                child = node.children[char] = TrieNode(char, None, False)
+                path.append(child)
+                node = child
+            node.frequency = frequencies[word]
+            node.is_last = True
+            previous = word
+
+        while path:
+            self._close_node(path.pop(), previous[:len(path)])
+        # the trie holds no reference cycles, so its nodes are still freed once unreachable
+        gc.freeze()
+
+    def _close_node(self, node, word):
+        """
+        fill the cached completions of a node whose subtree is complete, see _refresh_top()
+        """
+        # most nodes are a leaf or a link in a chain, which need no sorting
+        if not node.children:
+            # only the root of an empty trie is a leaf without a word
+            node.top = [(word, node.frequency)] if node.is_last else []
+        elif len(node.children) == 1 and not node.is_last:
+            for child in node.children.values():
+                node.top = list(child.top)
+        else:
+            self._refresh_top(node, word)
+
+    def _writable_path(self, word: str) -> [TrieNode]:
+        """
+        walk down a word, creating the missing nodes
+        In copy-on-write mode the existing nodes of the path are replaced by clones linked
+        to each other, so they can be changed freely until path[0] is published as the root.
+        @param word: the word to walk down
+        @return: the nodes from the root to the node spelling 'word'
+        """
+        node = self.root.clone() if self.copy_on_write else self.root
+        path = [node]
+        for char in word:
+            child = node.children.get(char)
+            if child is None:
+                child = TrieNode(char, None, False)
+            elif self.copy_on_write:
+                child = child.clone()
+            node.children[char] = child
+            node = child
+            path.append(node)
+
+        return path
+
+    def _refresh_top(self, node, word):
+        """
+        recompute the cached completions of a node from its own word and its children's caches
+        @param node: the node to be refreshed
+        @param word: the word spelled by the path from the root to 'node'
+        """
+        candidates = [entry for child in node.children.values() for entry in child.top]
+        if node.is_last:
+            candidates.append((word, node.frequency))
+        candidates.sort(key=_rank)
+        node.top = candidates[:TOP_K]
+
+    def _refresh_subtree(self, root, touched: set):
+        """
+        recompute the cached completions of the nodes below 'root' whose subtree changed, children before parents
+        @param root: the node whose subtree is refreshed, spelling the empty word
+        @param touched: ids of the nodes whose subtree changed, the others keep their caches
+        """
+        stack = [(root, '', False)]
+        while stack:
+            node, word, children_done = stack.pop()
+            if children_done:
+                self._refresh_top(node, word)
+            else:
+                stack.append((node, word, True))
+                for char, child in node.children.items():
+                    if id(child) in touched:
+                        stack.append((child, word + char, False))
+
+    def _offer(self, node, entry):
+        """
+        merge a newly added (word, frequency) into the cached completions of a node
+        @param node: a node on the path of the word
+        @param entry: (word, frequency) that was added below 'node'
+        """
+        if len(node.top) < TOP_K or _rank(entry) < _rank(node.top[-1]):
+            node.top.append(entry)
+            node.top.sort(key=_rank)
+            del node.top[TOP_K:]
+
     def search(self, word: str) -> int:
         """
         search for a word
@@ -80,31 +263,22 @@ class TrieDictionary(BaseDictionary):
         @param word_frequency: (word, frequency) to be added
         :return: True whether succeeded, False when word is already in the dictionary
         """
-        word_validation = False
-        node = self.root
-        for char in word_frequency.word:
-            found_in_child = False
-            for child in node.children:
-                if char == child:
-                    node = node.children[char] #set its value TrieNode
-                    found_in_child = True
-                    break
-            if not found_in_child:
-                new_node = TrieNode(char, None, False)
-                node.children[char] = new_node
-                node = new_node
-                word_validation = True
-        # if the last character is not found
-        if word_validation:
-            node.frequency = word_frequency.frequency
-            node.is_last = True
-        # if last character is found but it's not the last character yet, add its frequency
-        if found_in_child and not node.is_last:
+        with self.writer_lock:
+            # 1. walk down the word, creating the missing nodes and remembering the path
+            path = self._writable_path(word_frequency.word)
+            node = path[-1]
+            if node.is_last:
+                return False
+            # 2. mark the word and offer it to the cached completions along the path
             node.frequency = word_frequency.frequency
             node.is_last = True
-            word_validation = True
+            entry = (word_frequency.word, word_frequency.frequency)
+            for path_node in path:
+                self._offer(path_node, entry)
+            # 3. publish the changed path
+            self.root = path[0]
 
-        return word_validation
+        return True
 
     def delete_word(self, word: str) -> bool:
         """
@@ -112,54 +286,94 @@ class TrieDictionary(BaseDictionary):
         @param word: word to be deleted
         @return: whether succeeded, e.g. return False when point not found
         """
-        # validate if the word is deletable
-        node = self.root
-        for char in word:
-            found_in_child = False
-            for child in node.children:
-                if char == child:
-                    node = node.children[char] #set its value TrieNode
-                    found_in_child = True
-                    break
-            if not found_in_child:
+        with self.writer_lock:
+            # 1. validate if the word is deletable, then take the path to change
+            node = self.root
+            for char in word:
+                node = node.children.get(char)
+                if node is None:
+                    return False
+            if not node.is_last:
                 return False
-        # if last node has children, just update its statuses, otherwise execute recursive _delete algorithm
-        if len(node.children) > 0:
-            node.is_last = False
-            node.frequency = None
-        else:
-            self._delete(word, 0, self.root)
+            path = self._writable_path(word)
+            path[-1].is_last = False
+            path[-1].frequency = None
+            # 2. unlink the nodes that no longer lead to any word, bottom-up
+            depth = len(word)
+            while depth > 0 and not path[depth].children and not path[depth].is_last:
+                del path[depth - 1].children[word[depth - 1]]
+                depth -= 1
+            # 3. refresh the cached completions that listed the word; once a node's cache
+            #    doesn't hold it, none of its ancestors' caches can either
+            refreshed = 0
+            while depth >= 0 and any(entry[0] == word for entry in path[depth].top):
+                self._refresh_top(path[depth], word[:depth])
+                depth -= 1
+                refreshed += 1
+            # 4. publish the changed path
+            self.root = path[0]
+        if self.counters is not None:
+            self.counters['trie.cache_refreshes'] += refreshed
 
         return True
 
-    def _delete(self, word, i, current):
-        deletable = False
-        if i == len(word):
-            if not current.is_last:
+    def update_frequency(self, word: str, frequency: int) -> bool:
+        """
+        replace the frequency of a word already in the dictionary
+        @param word: the word to be updated
+        @param frequency: its new frequency, 0 or below deletes the word
+        @return: True whether succeeded, False when word is NOT in the dictionary
+        """
+        if frequency <= 0:
+            return self.delete_word(word)
+        with self.writer_lock:
+            # 1. validate if the word is stored, then take the path to change
+            node = self.root
+            for char in word:
+                node = node.children.get(char)
+                if node is None:
+                    return False
+            if not node.is_last:
                 return False
-            return len(current.children) == 0
-        char = word[i]
-        if char not in current.children:
-            return False
-        next_node = current.children[char]
-        should_delete_ref = self._delete(word, i+1, next_node)
-        # execute deleting child node if self._delete returns true
-        if should_delete_ref:
-            del current.children[char]
-            deletable = True
-
-        if current.is_last:
-            return False
-        if len(current.children) > 0:
-            return False
-
-        return deletable
-
-    def autocomplete(self, word: str) -> [WordFrequency]:
-        """
-        return a list of 3 most-frequent words in the dictionary that have 'word' as a prefix
+            path = self._writable_path(word)
+            path[-1].frequency = frequency
+            # 2. refresh the cached completions bottom-up while they list the word or it now
+            #    ranks into them; a cache that does neither means the same of every ancestor
+            entry = (word, frequency)
+            depth = len(word)
+            refreshed = 0
+            while depth >= 0:
+                top = path[depth].top
+                if not (any(cached[0] == word for cached in top) or len(top) < TOP_K or _rank(entry) < _rank(top[-1])):
+                    break
+                self._refresh_top(path[depth], word[:depth])
+                depth -= 1
+                refreshed += 1
+            if self.counters is not None:
+                self.counters['trie.cache_refreshes'] += refreshed
+            # 3. publish the changed path
+            self.root = path[0]
+
+        return True
+
+    def increment(self, word: str, delta: int) -> int:
+        """
+        add a delta to the frequency of a word, see BaseDictionary.increment()
+        @param word: the word to be updated
+        @param delta: the change of its frequency, possibly negative
+        @return: the new frequency, 0 if the word isn't in the dictionary afterwards
+        """
+        # the read and the write it leads to form one step for other writers
+        with self.writer_lock:
+            return super().increment(word, delta)
+
+    def autocomplete(self, word: str, k: int = 3, offset: int = 0) -> [WordFrequency]:
+        """
+        return a list of k most-frequent words in the dictionary that have 'word' as a prefix
         @param word: word to be autocompleted
-        @return: a list (could be empty) of (at most) 3 most-frequent words with prefix 'word'
+        @param k: number of words wanted
+        @param offset: number of best words to skip first, to page through the completions
+        @return: a list (could be empty) of (at most) k most-frequent words with prefix 'word'
         """
         node = self.root
         for char in word:
@@ -167,22 +381,175 @@ class TrieDictionary(BaseDictionary):
                 node = node.children[char]
             else:
                 return []
-        
-        self.frequent_words = []
-        self.depth_first_search(node, word[:-1])
+        if self.counters is not None:
+            self.counters['trie.visited'] += len(word) + 1
+
+        return [WordFrequency(entry[0], entry[1]) for entry in self._ranked_completions(node, word, k, offset)]
+
+    def _ranked_completions(self, node, word: str, k: int, offset: int = 0) -> [tuple[str, int]]:
+        """
+        @param node: the node spelling 'word'
+        @param word: the word spelled by the path from the root to 'node'
+        @param k: number of completions wanted
+        @param offset: number of best completions to skip first
+        @return: the (word, frequency) ranked offset + 1 to offset + k in the subtree of 'node', best first
+        """
+        # the node already caches the most frequent completions of its subtree
+        if k + offset <= TOP_K:
+            return node.top[offset:offset + k]
 
-        self.frequent_words.sort(key=lambda x: x[1], reverse=True)
-        most_frequent_words = []
-        for frequent_word in self.frequent_words[:3]:
-            most_frequent_words.append(WordFrequency(frequent_word[0], frequent_word[1]))
+        return list(islice(self._iter_ranked(node, word), offset, offset + k))
 
-        return most_frequent_words
+    def _iter_ranked(self, node, word: str):
+        """
+        generate the (word, frequency) in the subtree of a node, most frequent first
+        A best-first walk: every subtree waits in a heap under its best completion, the
+        first entry of its cache, so only the nodes leading to the words handed out are
+        expanded.
+        @param node: the node spelling 'word'
+        @param word: the word spelled by the path from the root to 'node'
+        """
+        if not node.top:
+            return
+        # each entry: (rank, 0, word, None) for a word or (rank of its best word, 1, its word, node) for a subtree
+        heap = [(_rank(node.top[0]), 1, word, node)]
+        while heap:
+            rank, kind, word, node = heapq.heappop(heap)
+            if kind == 0:
+                yield word, -rank[0]
+                continue
+            if node.is_last:
+                heapq.heappush(heap, ((-node.frequency, word), 0, word, None))
+            for char, child in node.children.items():
+                if child.top:
+                    heapq.heappush(heap, (_rank(child.top[0]), 1, word + char, child))
 
-    # additional my own function to do depth-first-search to get word by prefix
-    def depth_first_search(self, node, pre):
+    def iter_prefix(self, word: str):
+        """
+        generate every word in the dictionary that has 'word' as a prefix, lazily
+        @param word: the prefix, '' for the whole dictionary
+        @return: a generator of WordFrequency in alphabetical order of the words
+        """
+        node = self.root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return
         if node.is_last:
-            word_tuple = (pre + node.letter, node.frequency)
-            self.frequent_words.append(word_tuple)
+            yield WordFrequency(word, node.frequency)
+        # one iterator over the sorted children per level below the prefix, and one buffer
+        # holding the letters of the current path, so no string is built for a node without a word
+        letters = list(word)
+        stack = [iter(sorted(node.children.items()))]
+        while stack:
+            for char, child in stack[-1]:
+                letters.append(char)
+                if child.is_last:
+                    yield WordFrequency(''.join(letters), child.frequency)
+                stack.append(iter(sorted(child.children.items())))
+                break
+            else:
+                # this level is done, and so is the letter that led to it
+                stack.pop()
+                if stack:
+                    letters.pop()
+
+    def fuzzy_autocomplete(self, prefix_word: str, max_distance: int = 1, k: int = 3) -> [WordFrequency]:
+        """
+        return the most-frequent words that start with something within a few typos of 'prefix_word'
+        The trie is walked with one row of the Levenshtein table per node, the row of a node
+        holding the edit distance of its word to each prefix of 'prefix_word'. Distances above
+        'max_distance' are only kept as max_distance + 1, so each row is filled in a band of
+        2 * max_distance + 1 entries, and a branch is dropped once no entry of its row can lead
+        to a closer match than one already recorded above it.
+        @param prefix_word: word to be autocompleted
+        @param max_distance: most insertions, deletions and substitutions allowed
+        @param k: number of completions wanted
+        @return: a list (could be empty) of (at most) k words, closest first, then most frequent
+        """
+        root = self.root
+        cap = max_distance + 1
+        distance_of = {}
+        # each entry: a node, its word, its row and the smallest distance already recorded above it
+        stack = [(root, '', [min(j, cap) for j in range(len(prefix_word) + 1)], cap)]
+        visited = 0
+        while stack:
+            node, word, row, recorded = stack.pop()
+            visited += 1
+            # 1. the words below a node matching more closely than any ancestor are candidates
+            if row[-1] < recorded:
+                recorded = row[-1]
+                for entry in self._ranked_completions(node, word, k):
+                    if distance_of.get(entry, recorded + 1) > recorded:
+                        distance_of[entry] = recorded
+            # 2. distances only grow going down, so stop once none can beat what is recorded
+            if min(row) >= recorded:
+                continue
+            # 3. extend the row by each child's letter, inside the band around the diagonal
+            depth = len(word) + 1
+            lo = max(1, depth - max_distance)
+            hi = min(len(prefix_word), depth + max_distance)
+            for char, child in node.children.items():
+                child_row = [min(depth, cap)] + [cap] * len(prefix_word)
+                for j in range(lo, hi + 1):
+                    child_row[j] = min(row[j] + 1, child_row[j - 1] + 1,
+                                       row[j - 1] + (prefix_word[j - 1] != char), cap)
+                stack.append((child, word + char, child_row, recorded))
+        if self.counters is not None:
+            self.counters['trie.fuzzy_visited'] += visited
+
+        ranked = heapq.nsmallest(k, distance_of.items(), key=lambda item: (item[1], _rank(item[0])))
+        return [WordFrequency(entry[0], entry[1]) for entry, _ in ranked]
+
+    def _locate_many(self, words: [str]) -> dict:
+        """
+        follow several words from the root, walking each common prefix only once
+        @param words: the words (or prefixes) to be located
+        @return: mapping of each distinct word to the node spelling it, or None if there is none
+        """
+        nodes = {}
+        path = [self.root]      # path[i] spells previous[:i], shorter if the previous walk failed
+        previous = ''
+        for word in sorted(set(words)):
+            # 1. keep the part of the previous path shared with this word
+            common = 0
+            limit = min(len(word), len(previous), len(path) - 1)
+            while common < limit and word[common] == previous[common]:
+                common += 1
+            del path[common + 1:]
+            # 2. walk only the remaining letters
+            node = path[-1]
+            for char in word[common:]:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                path.append(node)
+            nodes[word] = node
+            previous = word
+            if self.counters is not None:
+                self.counters['trie.visited'] += len(word) - common
+
+        return nodes
+
+    def search_many(self, words: [str]) -> [int]:
+        """
+        search for several words, sharing the walk across common prefixes
+        @param words: the words to be searched
+        @return: the frequency of each word, 0 if NOT found, in the same order
+        """
+        nodes = self._locate_many(words)
+
+        return [nodes[word].frequency if nodes[word] and nodes[word].is_last else 0 for word in words]
+
+    def autocomplete_many(self, prefix_words: [str], k: int = 3) -> [[WordFrequency]]:
+        """
+        autocomplete several prefixes, sharing the walk across common prefixes
+        @param prefix_words: the prefixes to be autocompleted
+        @param k: number of words wanted per prefix
+        @return: the autocomplete() list of each prefix, in the same order
+        """
+        nodes = self._locate_many(prefix_words)
 
-        for child in node.children.values():
-            self.depth_first_search(child, pre + node.letter)
+        return [[WordFrequency(entry[0], entry[1])
+                 for entry in self._ranked_completions(nodes[prefix_word], prefix_word, k)]
+                if nodes[prefix_word] else [] for prefix_word in prefix_words]
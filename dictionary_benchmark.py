@@ -0,0 +1,439 @@
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from dictionary.backends import BACKENDS, create_dictionary
+from dictionary.loader import iter_word_frequencies
+from dictionary.linkedlist_dictionary import LinkedListDictionary, ORDERINGS
+from dictionary.sharded_dictionary import ShardedDictionary
+from dictionary.word_frequency import WordFrequency
+
+
+# -------------------------------------------------------------------
+# Benchmarks for the dictionary implementations.
+#
+# suite: builds every chosen backend in-process from every chosen dataset,
+#        then times S, A, D and AC separately under a workload mix and
+#        reports ops/sec, latency percentiles and peak build memory as CSV
+#        or JSON, one row per backend x dataset x operation.
+# zipf:  replays a Zipf-distributed query log of S and AC commands against
+#        every LinkedListDictionary ordering, the most frequent words of
+#        the data file being the most queried.
+# scaling: times adds and deletes after a few autocompletes, so the
+#        indexes they build are in place, on a small and a large dataset,
+#        and fails on a backend whose cost per mutation grows with the
+#        number of words.
+# profile: runs dictionary_file_based.py --profile on a command file with
+#        IC commands, as is and under --journal, and fails on a backend
+#        whose counters are missing from the report.
+# -------------------------------------------------------------------
+
+# share of each command in a workload
+MIXES = {
+    'read-heavy': {'S': 0.45, 'AC': 0.45, 'A': 0.05, 'D': 0.05},
+    'write-heavy': {'S': 0.15, 'AC': 0.15, 'A': 0.35, 'D': 0.35},
+    'balanced': {'S': 0.25, 'AC': 0.25, 'A': 0.25, 'D': 0.25},
+    'search-only': {'S': 1.0},
+    'autocomplete-only': {'AC': 1.0},
+}
+
+DATASETS = {
+    'toy': 'sampleDataToy.txt',
+    'sample': 'sampleData.txt',
+    '200k': 'sampleData200k.txt',
+}
+
+REPORT_FIELDS = ['backend', 'dataset', 'words', 'mix', 'operation', 'count', 'seconds', 'ops_per_sec',
+                 'p50_us', 'p95_us', 'p99_us', 'max_us', 'peak_memory_mb']
+
+_LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+def zipf_queries(words_frequencies, count: int, skew: float, seed: int) -> [(str, str)]:
+    """
+    generate a query log where the word of rank r is picked with weight 1 / r^skew
+    @param words_frequencies: the (word, frequency) of the data file
+    @param count: number of queries to generate
+    @param skew: Zipf exponent, larger values concentrate traffic on fewer words
+    @param seed: seed of the random generator
+    @return: list of (command, argument), an S for the word or an AC for one of its prefixes
+    """
+    generator = random.Random(seed)
+    ranked = sorted(words_frequencies, key=lambda x: x.frequency, reverse=True)
+    weights = [1 / rank ** skew for rank in range(1, len(ranked) + 1)]
+    queries = []
+    for wf_object in generator.choices(ranked, weights, k=count):
+        if generator.random() < 0.5:
+            queries.append(('S', wf_object.word))
+        else:
+            queries.append(('AC', wf_object.word[:generator.randint(1, len(wf_object.word))]))
+
+    return queries
+
+
+def replay(agent, queries: [(str, str)]) -> dict:
+    """
+    run a query log against a dictionary
+    @return: elapsed seconds per command
+    """
+    elapsed = {'S': 0.0, 'AC': 0.0}
+    for command, argument in queries:
+        start = time.perf_counter()
+        if command == 'S':
+            agent.search(argument)
+        else:
+            agent.autocomplete(argument)
+        elapsed[command] += time.perf_counter() - start
+
+    return elapsed
+
+
+def load_dataset(name: str) -> [WordFrequency]:
+    """
+    @param name: a key of DATASETS, 'scaled:<factor>' for sampleData.txt grown by a
+                 factor with suffixed words, or the path of a data file
+    @return: the (word, frequency) of the dataset
+    """
+    if name.startswith('scaled:'):
+        factor = int(name.split(':')[1])
+        base = list(iter_word_frequencies(DATASETS['sample']))
+        scaled = []
+        for copy in range(factor):
+            # copy n gets suffix n written in base 26, so every word stays unique
+            suffix = ''
+            n = copy
+            while n:
+                n, letter = divmod(n - 1, 26)
+                suffix = _LETTERS[letter] + suffix
+            scaled.extend(WordFrequency(wf_object.word + suffix, max(1, wf_object.frequency >> copy.bit_length()))
+                          for wf_object in base)
+        return scaled
+
+    return list(iter_word_frequencies(DATASETS.get(name, name)))
+
+
+def parse_prefix_lengths(spec: str) -> dict:
+    """
+    @param spec: comma separated 'length:weight' pairs, e.g. '1:1,2:2,3:3'
+    @return: mapping of prefix length to weight
+    """
+    lengths = {}
+    for pair in spec.split(','):
+        length, weight = pair.split(':')
+        lengths[int(length)] = float(weight)
+
+    return lengths
+
+
+def generate_workload(words_frequencies, mix: dict, count: int, prefix_lengths: dict, seed: int) -> [tuple]:
+    """
+    generate a stream of parsed commands (see dictionary.commands)
+    Searches mostly hit stored words, adds mostly bring new words, deletes target stored
+    words and autocomplete prefixes are cut from stored words at the given lengths.
+    @return: the commands
+    """
+    generator = random.Random(seed)
+    words = [wf_object.word for wf_object in words_frequencies]
+    lengths = list(prefix_lengths)
+    length_weights = list(prefix_lengths.values())
+    commands = []
+    for command in generator.choices(list(mix), list(mix.values()), k=count):
+        word = generator.choice(words)
+        if command == 'S' and generator.random() < 0.2:
+            word += generator.choice(_LETTERS)
+        elif command == 'A' and generator.random() < 0.8:
+            word += ''.join(generator.choices(_LETTERS, k=3))
+        if command == 'A':
+            commands.append(('A', word, generator.randint(1, 1000000)))
+        elif command == 'AC':
+            commands.append(('AC', word[:generator.choices(lengths, length_weights)[0]]))
+        else:
+            commands.append((command, word))
+
+    return commands
+
+
+def generate_stream(words_frequencies, mix: str, count: int, prefix_lengths: dict, seed: int,
+                    infix: bool = False) -> [tuple]:
+    """
+    generate a random command stream, a workload of generate_workload() with varied AC sizes
+    @param infix: turn some autocompletes into infix searches of a part of their prefix
+    @return: the commands
+    """
+    generator = random.Random(seed)
+    commands = []
+    for command in generate_workload(words_frequencies, MIXES[mix], count, prefix_lengths, seed):
+        if command[0] == 'AC':
+            k = generator.choice((1, 3, 3, 5, 10))
+            if infix and command[1] and generator.random() < 0.5:
+                command = ('IC', command[1][generator.randint(0, len(command[1]) - 1):])
+            command = command + (k,) if k != 3 else command
+        commands.append(command)
+
+    return commands
+
+
+def _report_row(backend, dataset, words, mix, operation, latencies_ns, peak_memory=None) -> dict:
+    """
+    summarise the latencies of one operation
+    @param peak_memory: peak memory in bytes, or 'n/a' when it can't be measured
+    """
+    latencies_ns = sorted(latencies_ns)
+    seconds = sum(latencies_ns) / 1e9
+
+    def percentile(fraction):
+        return round(latencies_ns[min(len(latencies_ns) - 1, int(fraction * len(latencies_ns)))] / 1e3, 2)
+
+    return {'backend': backend, 'dataset': dataset, 'words': words, 'mix': mix, 'operation': operation,
+            'count': len(latencies_ns), 'seconds': round(seconds, 6),
+            'ops_per_sec': round(len(latencies_ns) / seconds, 1) if seconds else None,
+            'p50_us': percentile(0.50), 'p95_us': percentile(0.95), 'p99_us': percentile(0.99),
+            'max_us': round(latencies_ns[-1] / 1e3, 2),
+            'peak_memory_mb': round(peak_memory / 2 ** 20, 2) if isinstance(peak_memory, int) else peak_memory}
+
+
+def benchmark_backend(backend: str, dataset: str, words_frequencies, mix: str, commands: [tuple]) -> [dict]:
+    """
+    time the build and every operation of one backend on one dataset
+    @return: one report row for the build and one per operation in the workload
+    """
+    # 1. peak memory of a traced build, then a separate untraced build for the timing
+    #    tracemalloc only sees this process, so the memory of sharded workers is left out
+    if issubclass(BACKENDS[backend], ShardedDictionary):
+        peak_memory = 'n/a'
+    else:
+        tracemalloc.start()
+        create_dictionary(backend).build_dictionary(words_frequencies)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    agent = create_dictionary(backend)
+    try:
+        start = time.perf_counter_ns()
+        agent.build_dictionary(words_frequencies)
+        rows = [_report_row(backend, dataset, len(words_frequencies), mix, 'build',
+                            [time.perf_counter_ns() - start], peak_memory)]
+        # 2. one timed call per command, grouped by command
+        latencies = {}
+        for command in commands:
+            if command[0] == 'A':
+                word_frequency = WordFrequency(command[1], command[2])
+                start = time.perf_counter_ns()
+                agent.add_word_frequency(word_frequency)
+            elif command[0] == 'S':
+                start = time.perf_counter_ns()
+                agent.search(command[1])
+            elif command[0] == 'D':
+                start = time.perf_counter_ns()
+                agent.delete_word(command[1])
+            else:
+                start = time.perf_counter_ns()
+                agent.autocomplete(*command[1:])
+            latencies.setdefault(command[0], []).append(time.perf_counter_ns() - start)
+    finally:
+        # the sharded backend has worker processes of its own
+        if hasattr(agent, 'close'):
+            agent.close()
+    for operation in ('S', 'A', 'D', 'AC'):
+        if operation in latencies:
+            rows.append(_report_row(backend, dataset, len(words_frequencies), mix, operation, latencies[operation]))
+
+    return rows
+
+
+def write_report(rows: [dict], report_format: str, output):
+    if report_format == 'json':
+        json.dump(rows, output, indent=2)
+        output.write('\n')
+    else:
+        writer = csv.DictWriter(output, REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def mutation_cost(backend: str, dataset: str, operations: int, seed: int) -> float:
+    """
+    time deletes and re-adds of random words once a few autocompletes have been answered
+    @return: the mean microseconds per add or delete
+    """
+    words_frequencies = load_dataset(dataset)
+    chosen = random.Random(seed).sample(words_frequencies, min(operations, len(words_frequencies)))
+    agent = create_dictionary(backend)
+    try:
+        agent.build_dictionary(words_frequencies)
+        for prefix_word in ('', 'a', 'ab', 'abc', 'abcd'):
+            agent.autocomplete(prefix_word)
+        start = time.perf_counter_ns()
+        for wf_object in chosen:
+            agent.delete_word(wf_object.word)
+        for wf_object in chosen:
+            agent.add_word_frequency(wf_object)
+        elapsed_ns = time.perf_counter_ns() - start
+    finally:
+        if hasattr(agent, 'close'):
+            agent.close()
+
+    return elapsed_ns / (2 * len(chosen)) / 1e3
+
+
+def _profile_counters(backend: str, data_filename: str, command_filename: str, journal: bool) -> dict:
+    """
+    run dictionary_file_based.py with --profile, writing the report as JSON
+    @param journal: whether to keep the changes in a fresh journal directory too
+    @return: the counters of the report
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        report_filename = os.path.join(directory, 'report.json')
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dictionary_file_based.py')
+        arguments = [sys.executable, script, backend, data_filename, command_filename,
+                     os.path.join(directory, 'output.txt'), '--profile=' + report_filename]
+        if journal:
+            arguments.append('--journal=' + os.path.join(directory, 'journal'))
+        subprocess.run(arguments, check=True, stdout=subprocess.DEVNULL)
+        with open(report_filename, 'r') as report_file:
+            return json.load(report_file)['counters']
+
+
+def run_suite(options):
+    prefix_lengths = parse_prefix_lengths(options.prefix_lengths)
+    rows = []
+    for dataset in options.datasets.split(','):
+        words_frequencies = load_dataset(dataset)
+        for mix in options.mixes.split(','):
+            commands = generate_workload(words_frequencies, MIXES[mix], options.operations, prefix_lengths,
+                                         options.seed)
+            for backend in options.backends.split(','):
+                print(f'{backend} on {dataset} ({mix})', file=sys.stderr)
+                rows.extend(benchmark_backend(backend, dataset, words_frequencies, mix, commands))
+
+    if options.output:
+        with open(options.output, 'w', newline='') as output:
+            write_report(rows, options.format, output)
+    else:
+        write_report(rows, options.format, sys.stdout)
+
+
+def run_zipf(options):
+    words_frequencies = list(iter_word_frequencies(options.data))
+    queries = zipf_queries(words_frequencies, options.queries, options.skew, options.seed)
+    print(f"{len(queries)} queries, skew {options.skew}, over {len(words_frequencies)} words of {options.data}")
+    print(f"{'ordering':<16}{'indexed':<9}{'S seconds':>11}{'AC seconds':>12}{'queries/s':>12}")
+    for ordering in ORDERINGS:
+        for indexed in (False, True):
+            agent = LinkedListDictionary(indexed=indexed, ordering=ordering)
+            agent.build_dictionary(words_frequencies)
+            elapsed = replay(agent, queries)
+            total = elapsed['S'] + elapsed['AC']
+            print(f"{ordering:<16}{str(indexed):<9}{elapsed['S']:>11.3f}{elapsed['AC']:>12.3f}"
+                  f"{len(queries) / total:>12.0f}")
+
+
+def run_scaling(options) -> bool:
+    # one backend at a time, so the timings don't compete for the CPUs
+    backends = options.backends.split(',')
+    print(f"{'backend':<12}{options.small + ' us':>12}{options.large + ' us':>12}{'growth':>9}")
+    passed = 0
+    for backend in backends:
+        small = mutation_cost(backend, options.small, options.operations, options.seed)
+        large = mutation_cost(backend, options.large, options.operations, options.seed)
+        growth = large / small
+        passed += growth <= options.max_growth
+        print(f"{backend:<12}{small:>12.2f}{large:>12.2f}{growth:>8.1f}x"
+              f"{'' if growth <= options.max_growth else '  FAILED'}")
+
+    print(f'\nSUMMARY: {passed} out of {len(backends)} backends kept adds and deletes '
+          f'within {options.max_growth}x from {options.small} to {options.large}.')
+    return passed == len(backends)
+
+
+def run_profile(options) -> bool:
+    backends = options.backends.split(',')
+    data_filename = os.path.abspath(DATASETS.get(options.data, options.data))
+    commands = generate_stream(load_dataset(options.data), 'balanced', options.operations,
+                               parse_prefix_lengths('1:1,2:2,3:3,4:2,6:1'), options.seed, infix=True)
+    with tempfile.TemporaryDirectory() as directory:
+        command_filename = os.path.join(directory, 'commands.in')
+        with open(command_filename, 'w') as command_file:
+            command_file.writelines(' '.join(map(str, command)) + '\n' for command in commands)
+        with ProcessPoolExecutor(max_workers=options.workers) as pool:
+            futures = {(backend, journal): pool.submit(_profile_counters, backend, data_filename,
+                                                       command_filename, journal)
+                       for backend in backends for journal in (False, True)}
+            passed = 0
+            for (backend, journal), future in futures.items():
+                counters = future.result()
+                # every counter of a backend is named after it
+                counted = any(name.startswith(backend + '.') for name in counters)
+                passed += counted
+                print(f"{backend:<12}{'--journal' if journal else '':<11}{'passed' if counted else 'FAILED'}")
+                if options.verbose:
+                    for name, value in sorted(counters.items()):
+                        print(f'    {name:<30}{value:>9}')
+
+    print(f'\nSUMMARY: {passed} out of {len(futures)} profiled runs reported their backend counters.')
+    return passed == len(futures)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmarks for the dictionary implementations.')
+    commands = parser.add_subparsers(dest='benchmark', required=True)
+
+    suite = commands.add_parser('suite', help='time build, S, A, D and AC of every backend on every dataset')
+    suite.add_argument('--backends', default='array,linkedlist,trie',
+                       help='comma separated backends, out of ' + ', '.join(BACKENDS))
+    suite.add_argument('--datasets', default='toy,sample',
+                       help="comma separated datasets, out of " + ', '.join(DATASETS) +
+                            ", 'scaled:<factor>' or a data file path")
+    suite.add_argument('--mixes', default='read-heavy', help='comma separated mixes, out of ' + ', '.join(MIXES))
+    suite.add_argument('--operations', type=int, default=2000, help='number of commands per workload')
+    suite.add_argument('--prefix-lengths', default='1:1,2:2,3:3,4:2,5:1',
+                       help="autocomplete prefix length distribution as 'length:weight' pairs")
+    suite.add_argument('--format', choices=('csv', 'json'), default='csv', help='report format')
+    suite.add_argument('--output', help='report file, standard output by default')
+    suite.add_argument('--seed', type=int, default=2022, help='seed of the workload generator')
+    suite.set_defaults(run=run_suite)
+
+    zipf = commands.add_parser('zipf', help='replay a Zipf query log against the linked-list orderings')
+    zipf.add_argument('--data', default='sampleData.txt', help='data file to build from')
+    zipf.add_argument('--queries', type=int, default=20000, help='number of queries in the log')
+    zipf.add_argument('--skew', type=float, default=1.0, help='Zipf exponent')
+    zipf.add_argument('--seed', type=int, default=2022, help='seed of the query generator')
+    zipf.set_defaults(run=run_zipf)
+
+    scaling = commands.add_parser('scaling', help='check that adds and deletes after an autocomplete '
+                                                  "don't slow down as the dictionary grows")
+    scaling.add_argument('--backends', default='hashtable',
+                         help='comma separated backends meant to add and delete in O(1), out of ' +
+                              ', '.join(BACKENDS))
+    scaling.add_argument('--small', default='sample', help='the small dataset')
+    scaling.add_argument('--large', default='200k', help='the large dataset')
+    scaling.add_argument('--operations', type=int, default=2000, help='words deleted and added back')
+    scaling.add_argument('--max-growth', type=float, default=3.0,
+                         help='largest accepted ratio of the large to the small cost per mutation')
+    scaling.add_argument('--seed', type=int, default=2022, help='seed of the word sample')
+    scaling.set_defaults(run=run_scaling)
+
+    profile = commands.add_parser('profile',
+                                  help='check that --profile reports the backend counters on IC command files')
+    profile.add_argument('-v', '--verbose', action='store_true', help='print the counters of every profiled run')
+    profile.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    profile.add_argument('--data', default='sample', help="dataset, out of " + ', '.join(DATASETS) + " or a data file")
+    profile.add_argument('--backends', default='array,columnar,linkedlist,trie,radixtrie,hashtable',
+                         help='comma separated backends that keep counters, out of ' + ', '.join(BACKENDS))
+    profile.add_argument('--operations', type=int, default=200, help='number of commands in the command file')
+    profile.add_argument('--seed', type=int, default=2022, help='seed of the command file')
+    profile.set_defaults(run=run_profile)
+
+    options = parser.parse_args(argv)
+    # the checks report failure with the exit status
+    if options.run(options) is False:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
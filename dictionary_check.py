@@ -0,0 +1,237 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dictionary.backends import BACKENDS, create_dictionary
+from dictionary.cached_dictionary import CachedDictionary
+from dictionary.commands import format_result, parse_command
+from dictionary.infix_dictionary import InfixDictionary
+from dictionary.journal import JournaledDictionary
+from dictionary.linkedlist_dictionary import LinkedListDictionary, ORDERINGS
+from dictionary.static_trie_dictionary import StaticTrieDictionary
+from dictionary.trie_dictionary import TrieDictionary
+from dictionary_benchmark import DATASETS, MIXES, generate_stream, load_dataset, parse_prefix_lengths
+from dictionary_test_script import evaluate
+
+
+# -------------------------------------------------------------------
+# Parallel, in-process test runner and differential checker.
+#
+# expected:     runs every backend x command file combination across a
+#               process pool and diffs each output against the .exp file
+#               next to the command file, as dictionary_test_script.py does.
+#               A command file with a .args file of extra options is left
+#               to dictionary_test_script.py.
+# differential: replays random command streams against every backend, and
+#               every variant of them listed in VARIANTS, across a process
+#               pool and reports the first command on which a backend
+#               disagrees with the first one listed, and any difference in
+#               the final contents.
+#
+# Every worker loads a dataset once and builds each dictionary from that
+# copy, and the commands run through apply_commands() and format_result()
+# exactly as in dictionary_file_based.py.
+# -------------------------------------------------------------------
+
+# datasets loaded by this worker process, by name
+_datasets = {}
+
+
+def _journaled() -> JournaledDictionary:
+    # a fresh journal directory, compacted often enough for the streams to go through compactions
+    return JournaledDictionary.recover(TrieDictionary(), tempfile.mkdtemp(prefix='journal-'),
+                                       batch_size=64, compact_records=512)
+
+
+# the backends under settings other than their defaults, by name
+VARIANTS = {
+    **{f'linkedlist-{ordering}': lambda ordering=ordering: LinkedListDictionary(ordering=ordering)
+       for ordering in ORDERINGS if ordering != 'insertion'},
+    **{f'linkedlist-{ordering}-indexed': lambda ordering=ordering: LinkedListDictionary(True, ordering)
+       for ordering in ORDERINGS},
+    'trie-cow': lambda: TrieDictionary(copy_on_write=True),
+    # a small overlay, so the streams merge it into the arrays many times
+    'statictrie-merging': lambda: StaticTrieDictionary(overlay_limit=64),
+    # small caches, so the streams evict entries as well as invalidate them
+    'cached-lru': lambda: CachedDictionary(TrieDictionary(), maxsize=64, policy='lru'),
+    'cached-lfu': lambda: CachedDictionary(TrieDictionary(), maxsize=64, policy='lfu'),
+    'journaled': _journaled,
+}
+
+
+def _create(name: str):
+    """
+    @param name: a backend of BACKENDS or a variant of VARIANTS
+    @return: a new, empty dictionary
+    """
+    return VARIANTS[name]() if name in VARIANTS else create_dictionary(name)
+
+
+def _dataset(name: str):
+    if name not in _datasets:
+        _datasets[name] = load_dataset(name)
+    return _datasets[name]
+
+
+def _run(backend: str, dataset: str, commands: [tuple]) -> ([str], [tuple]):
+    """
+    build a fresh dictionary and run a command stream against it
+    @return: (the output line of every command, the final (word, frequency) contents in alphabetical order)
+    """
+    dictionary = _create(backend)
+    try:
+        dictionary.build_dictionary(_dataset(dataset))
+        agent = InfixDictionary(dictionary) if any(command[0] == 'IC' for command in commands) else dictionary
+        results = agent.apply_commands(commands)
+        # a journal is checked by what a restart recovers from it
+        if isinstance(dictionary, JournaledDictionary):
+            dictionary.close()
+            agent = dictionary = JournaledDictionary.recover(TrieDictionary(), dictionary.directory)
+        contents = [(item.word, item.frequency) for item in agent.iter_prefix('')]
+    finally:
+        # the sharded backend has worker processes of its own, and a journal its files
+        if hasattr(dictionary, 'close'):
+            dictionary.close()
+        if isinstance(dictionary, JournaledDictionary):
+            shutil.rmtree(dictionary.directory)
+
+    return [format_result(command, result) for command, result in zip(commands, results)], contents
+
+
+def _check_expected(backend: str, dataset: str, command_filename: str, output_dir: str) -> (bool, [str]):
+    """
+    run one command file against one backend and compare the output with the expected file
+    @return: (whether it passed, the differing lines)
+    """
+    commands = []
+    with open(command_filename, 'r') as command_file:
+        for line in command_file:
+            # an unknown command is skipped, as the file based driver does
+            try:
+                commands.append(parse_command(line))
+            except ValueError:
+                pass
+    lines, _ = _run(backend, dataset, commands)
+    test_name = os.path.splitext(os.path.basename(command_filename))[0]
+    output_filename = os.path.join(output_dir, test_name + '-' + backend + '.out')
+    with open(output_filename, 'w') as output_file:
+        output_file.write(''.join(lines))
+
+    return evaluate(os.path.splitext(command_filename)[0] + '.exp', output_filename)
+
+
+def _differential_stream(backend: str, dataset: str, mix: str, count: int, prefix_lengths: dict, seed: int,
+                         infix: bool) -> ([tuple], [str], [tuple]):
+    commands = generate_stream(_dataset(dataset), mix, count, prefix_lengths, seed, infix)
+    lines, contents = _run(backend, dataset, commands)
+
+    return commands, lines, contents
+
+
+def run_expected(options) -> bool:
+    backends = options.backends.split(',')
+    os.makedirs(options.output_dir, exist_ok=True)
+    # the options of a .args file only reach dictionary_file_based.py through dictionary_test_script.py
+    command_filenames = []
+    for command_filename in options.command_files:
+        if os.path.isfile(os.path.splitext(command_filename)[0] + '.args'):
+            print(f"{'':<12}{os.path.basename(command_filename):<16}skipped, run it with dictionary_test_script.py")
+        else:
+            command_filenames.append(command_filename)
+    with ProcessPoolExecutor(max_workers=options.workers) as pool:
+        futures = {(backend, command_filename): pool.submit(_check_expected, backend, options.data,
+                                                            os.path.abspath(command_filename), options.output_dir)
+                   for backend in backends for command_filename in command_filenames}
+        passed = 0
+        for (backend, command_filename), future in futures.items():
+            test_passed, failed_output = future.result()
+            passed += test_passed
+            print(f"{backend:<12}{os.path.basename(command_filename):<16}{'passed' if test_passed else 'FAILED'}")
+            if options.verbose:
+                for line in failed_output:
+                    print('    ' + line)
+
+    print(f'\nSUMMARY: {passed} out of {len(futures)} tests passed.')
+    return passed == len(futures)
+
+
+def run_differential(options) -> bool:
+    backends = options.backends.split(',')
+    prefix_lengths = parse_prefix_lengths(options.prefix_lengths)
+    seeds = [options.seed + stream for stream in range(options.streams)]
+    with ProcessPoolExecutor(max_workers=options.workers) as pool:
+        futures = {(seed, backend): pool.submit(_differential_stream, backend, options.data, options.mix,
+                                                options.operations, prefix_lengths, seed, options.infix)
+                   for seed in seeds for backend in backends}
+        agreed = 0
+        for seed in seeds:
+            commands, reference_lines, reference_contents = futures[(seed, backends[0])].result()
+            mismatches = []
+            for backend in backends[1:]:
+                _, lines, contents = futures[(seed, backend)].result()
+                # 1. the first command answered differently
+                for index, (command, expected, actual) in enumerate(zip(commands, reference_lines, lines)):
+                    if expected != actual:
+                        mismatches.append(f'    {backend}: command {index + 1} {command}\n'
+                                          f'        {backends[0]}: {expected.strip()}\n'
+                                          f'        {backend}: {actual.strip()}')
+                        break
+                # 2. differences in the final contents that no command happened to show
+                else:
+                    if contents != reference_contents:
+                        missing = sorted(set(reference_contents) - set(contents))[:3]
+                        extra = sorted(set(contents) - set(reference_contents))[:3]
+                        mismatches.append(f'    {backend}: final contents differ, '
+                                          f'lacking {missing} and holding {extra}')
+            if mismatches:
+                print(f'stream {seed}: backends disagree')
+                print('\n'.join(mismatches))
+            else:
+                agreed += 1
+                if options.verbose:
+                    print(f'stream {seed}: {len(backends)} backends agree on {len(commands)} commands')
+
+    print(f'\nSUMMARY: {agreed} out of {len(seeds)} streams agreed across {", ".join(backends)}.')
+    return agreed == len(seeds)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Parallel test runner and differential checker.')
+    commands = parser.add_subparsers(dest='check', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-v', '--verbose', action='store_true', help='print the details of passing and failing checks')
+    common.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+
+    expected = commands.add_parser('expected', parents=[common],
+                                   help='diff every backend x command file against the .exp files')
+    expected.add_argument('data', help="data file, or one of " + ', '.join(DATASETS))
+    expected.add_argument('command_files', nargs='+', help='command files, each with a .exp file of the same name')
+    expected.add_argument('--backends', default=','.join(BACKENDS),
+                          help='comma separated backends, out of ' + ', '.join(BACKENDS))
+    expected.add_argument('--output-dir', default='.', help='directory for the <test>-<backend>.out files')
+    expected.set_defaults(run=run_expected)
+
+    differential = commands.add_parser('differential', parents=[common],
+                                       help='cross-check the backends on random command streams')
+    differential.add_argument('--data', default='sample',
+                              help="dataset, out of " + ', '.join(DATASETS) + ", 'scaled:<factor>' or a data file")
+    differential.add_argument('--backends', default=','.join([*BACKENDS, *VARIANTS]),
+                              help='comma separated backends and variants, the first one being the reference, '
+                                   'out of ' + ', '.join([*BACKENDS, *VARIANTS]))
+    differential.add_argument('--streams', type=int, default=8, help='number of random command streams')
+    differential.add_argument('--operations', type=int, default=2000, help='number of commands per stream')
+    differential.add_argument('--mix', choices=list(MIXES), default='balanced', help='workload mix')
+    differential.add_argument('--prefix-lengths', default='0:1,1:2,2:2,3:3,4:2,6:1',
+                              help="autocomplete prefix length distribution as 'length:weight' pairs")
+    differential.add_argument('--infix', action='store_true', help='mix infix searches (IC) into the streams')
+    differential.add_argument('--seed', type=int, default=2022, help='seed of the first stream')
+    differential.set_defaults(run=run_differential)
+
+    options = parser.parse_args(argv)
+    sys.exit(0 if options.run(options) else 1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,9 +1,9 @@
 import sys
-from dictionary.word_frequency import WordFrequency
+from contextlib import nullcontext
+from dictionary.commands import format_result, parse_command
 from dictionary.base_dictionary import BaseDictionary
-from dictionary.array_dictionary import ArrayDictionary
-from dictionary.linkedlist_dictionary import LinkedListDictionary
-from dictionary.trie_dictionary import TrieDictionary
+from dictionary.backends import BACKENDS, close_agent, load_agent
+from dictionary.profiling import ProfiledDictionary, Profiler
 
 
 # -------------------------------------------------------------------
@@ -23,100 +23,88 @@ def usage():
     """
     # On Teaching servers, use 'python3'
     # On Windows, you may need to use 'python' instead of 'python3'
-    print('python3 dictionary_file_based.py', '<approach> <data fileName> <command fileName> <output fileName>')
-    print('<approach> = <array | linkedlist | trie>')
+    print('python3 dictionary_file_based.py', '<approach> <data fileName> <command fileName> <output fileName>',
+          '[--merge=<delta fileName>]... [--journal=<directory>] [--profile[=<report fileName>]]')
+    print('<approach> = <' + ' | '.join(BACKENDS) + '>')
+    print('<data fileName> may be a .snap file written by python3 -m dictionary.snapshot (columnar, statictrie)')
+    print('--merge folds a file of word/delta lines into the loaded words before the commands run')
+    print('--journal keeps every change in a journal directory, which holds the words from then on:')
+    print('          the data file seeds an empty directory and later runs recover from the directory')
+    print('--profile prints a timing summary to stderr, --profile=<report fileName> writes it as JSON')
     sys.exit(1)
 
 
 if __name__ == '__main__':
-    # Fetch the command line arguments
-    args = sys.argv
+    # Fetch the command line arguments, the options may appear anywhere
+    profile_options = [arg for arg in sys.argv if arg == '--profile' or arg.startswith('--profile=')]
+    merge_options = [arg for arg in sys.argv if arg.startswith('--merge=')]
+    journal_options = [arg for arg in sys.argv if arg.startswith('--journal=')]
+    args = [arg for arg in sys.argv if arg not in profile_options and arg not in merge_options
+            and arg not in journal_options]
+    profiler = Profiler() if profile_options else None
+    phase = profiler.phase if profiler else lambda name: nullcontext()
 
     if len(args) != 5:
         print('Incorrect number of arguments.')
         usage()
 
-    # initialise search agent
-    agent: BaseDictionary = None
-    if args[1] == 'array':
-        agent = ArrayDictionary()
-    elif args[1] == 'linkedlist':
-        agent = LinkedListDictionary()
-    elif args[1] == 'trie':
-        agent = TrieDictionary()
-    else:
+    if args[1] not in BACKENDS:
         print('Incorrect argument value.')
         usage()
 
-    # read from data file to populate the initial set of points
+    # Parse the commands in command file first, so a missing command file is reported before any loading
     data_filename = args[2]
-    words_frequencies_from_file = []
-    try:
-        data_file = open(data_filename, 'r')
-        for line in data_file:
-            values = line.split()
-            word = values[0]
-            frequency = int(values[1])
-            word_frequency = WordFrequency(word, frequency)  # each line contains a word and its frequency
-            words_frequencies_from_file.append(word_frequency)
-        data_file.close()
-        agent.build_dictionary(words_frequencies_from_file)
-    except FileNotFoundError as e:
-        print("Data file doesn't exist.")
-        usage()
-
     command_filename = args[3]
     output_filename = args[4]
-    # Parse the commands in command file
     try:
         command_file = open(command_filename, 'r')
-        output_file = open(output_filename, 'w')
-
+        commands = []
         for line in command_file:
-            command_values = line.split()
-            command = command_values[0]
-            # search
-            if command == 'S':
-                word = command_values[1]
-                search_result = agent.search(word)
-                if search_result > 0:
-                    output_file.write(f"Found '{word}' with frequency {search_result}\n")
-                else:
-                    output_file.write(f"NOT Found '{word}'\n")
-
-            # add
-            elif command == 'A':
-                word = command_values[1]
-                frequency = int(command_values[2])
-                word_frequency = WordFrequency(word, frequency)
-                if not agent.add_word_frequency(word_frequency):
-                    output_file.write(f"Add '{word}' failed\n")
-                else:
-                    output_file.write(f"Add '{word}' succeeded\n")
-
-            # delete
-            elif command == 'D':
-                word = command_values[1]
-                if not agent.delete_word(word):
-                    output_file.write(f"Delete '{word}' failed\n")
-                else:
-                    output_file.write(f"Delete '{word}' succeeded\n")
-
-            # check
-            elif command == 'AC':
-                word = command_values[1]
-                list_words = agent.autocomplete(word)
-                line = "Autocomplete for '" + word + "': [ "
-                for item in list_words:
-                    line = line + item.word + ": " + str(item.frequency) + "  "
-                output_file.write(line + ']\n')
-
-            else:
+            try:
+                commands.append(parse_command(line))
+            except ValueError:
                 print('Unknown command.')
                 print(line)
-
-        output_file.close()
         command_file.close()
     except FileNotFoundError as e:
         print("Command file doesn't exist.")
         usage()
+
+    # initialise search agent from the data file, the journal and the delta files,
+    # IC commands need the trigram index
+    agent: BaseDictionary = None
+    journal_directory = journal_options[-1].partition('=')[2] if journal_options else None
+    merge_filenames = [merge_option.partition('=')[2] for merge_option in merge_options]
+    try:
+        agent = load_agent(args[1], data_filename, journal_directory, merge_filenames,
+                           infix=any(command[0] == 'IC' for command in commands),
+                           phase=profiler.phase if profiler else None)
+    except FileNotFoundError as e:
+        print("Data file doesn't exist." if e.filename == data_filename else "Delta file doesn't exist.")
+        usage()
+    except ValueError as e:
+        # e.g. a snapshot of another backend, version or byte order
+        print(f"Data can't be loaded: {e}")
+        usage()
+
+    # run the commands as one batch and write the buffered output in one go
+    try:
+        if profiler:
+            agent = ProfiledDictionary(agent, profiler)
+        with phase('commands'):
+            results = agent.apply_commands(commands)
+        with phase('output'):
+            output_file = open(output_filename, 'w')
+            output_file.write(''.join(format_result(command, result) for command, result in zip(commands, results)))
+            output_file.close()
+    finally:
+        # the journal commits its last records and a sharded backend stops its workers, even after an error
+        with phase('close'):
+            close_agent(agent)
+
+    if profiler:
+        report_filename = profile_options[-1].partition('=')[2]
+        if report_filename:
+            profiler.write_report(report_filename)
+        else:
+            sys.stderr.write(profiler.summary())
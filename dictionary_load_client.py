@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import sys
+import time
+from dictionary_benchmark import MIXES, generate_workload, load_dataset, parse_prefix_lengths
+
+
+# -------------------------------------------------------------------
+# Load generator for dictionary_server.py.
+# Opens several connections, keeps a window of pipelined commands in flight
+# on each, and reports throughput and latency percentiles. The commands come
+# from a command file, or are generated from a data file under a workload
+# mix of dictionary_benchmark.py.
+# -------------------------------------------------------------------
+
+def _as_line(command: tuple) -> str:
+    return ' '.join(str(value) for value in command) + '\n'
+
+
+async def _open(options):
+    if options.unix:
+        return await asyncio.open_unix_connection(options.unix)
+    return await asyncio.open_connection(options.host, options.port)
+
+
+async def run_connection(options, lines: [str], latencies: [float]):
+    """
+    send the lines over one connection, at most options.window of them unanswered at a time
+    """
+    reader, writer = await _open(options)
+    window = asyncio.Semaphore(options.window)
+    sent_at = asyncio.Queue()
+
+    async def send():
+        for line in lines:
+            await window.acquire()
+            await sent_at.put(time.perf_counter())
+            writer.write(line.encode('utf-8'))
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    for _ in lines:
+        response = await reader.readline()
+        if not response:
+            raise ConnectionError('server closed the connection')
+        latencies.append(time.perf_counter() - await sent_at.get())
+        window.release()
+    await sender
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_load(options, lines: [str]):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_connection(options, lines, latencies) for _ in range(options.connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1e3
+
+    print(f'{len(latencies)} requests over {options.connections} connections, window {options.window}')
+    print(f'throughput   {len(latencies) / elapsed:,.0f} requests/s')
+    print(f'latency ms   p50 {percentile(0.50):.3f}  p95 {percentile(0.95):.3f}  '
+          f'p99 {percentile(0.99):.3f}  max {latencies[-1] * 1e3:.3f}')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Generate load against dictionary_server.py.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--commands', help='command file to replay on every connection')
+    source.add_argument('--data', help="data file (or dictionary_benchmark.py dataset name) to generate commands from")
+    parser.add_argument('--mix', default='read-heavy', choices=list(MIXES), help='mix of generated commands')
+    parser.add_argument('--operations', type=int, default=10000, help='generated commands per connection')
+    parser.add_argument('--prefix-lengths', default='1:1,2:2,3:3,4:2,5:1', help="'length:weight' pairs for AC")
+    parser.add_argument('--connections', type=int, default=8, help='concurrent connections')
+    parser.add_argument('--window', type=int, default=32, help='pipelined commands in flight per connection')
+    parser.add_argument('--host', default='127.0.0.1', help='server address')
+    parser.add_argument('--port', type=int, default=7070, help='server port')
+    parser.add_argument('--unix', help='connect to this Unix socket path instead of TCP')
+    parser.add_argument('--seed', type=int, default=2022, help='seed of the command generator')
+    options = parser.parse_args(argv)
+
+    if options.commands:
+        with open(options.commands) as command_file:
+            lines = [line if line.endswith('\n') else line + '\n' for line in command_file if line.strip()]
+    else:
+        commands = generate_workload(load_dataset(options.data), MIXES[options.mix], options.operations,
+                                     parse_prefix_lengths(options.prefix_lengths), options.seed)
+        lines = [_as_line(command) for command in commands]
+    asyncio.run(run_load(options, lines))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
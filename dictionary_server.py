@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dictionary.backends import BACKENDS, close_agent, load_agent
+from dictionary.base_dictionary import BaseDictionary
+from dictionary.commands import format_result, parse_command
+from dictionary.infix_dictionary import InfixDictionary
+from dictionary.journal import JournaledDictionary
+from dictionary.word_frequency import WordFrequency
+
+
+# -------------------------------------------------------------------
+# Long-lived query server.
+# Loads the dictionary once, then answers the command file protocol
+# (S / A / D / AC / IC, one command per line) over TCP or a Unix socket, one
+# output-file line per command line, in order.
+#
+# - Clients may pipeline: every command read is dispatched at once, and the
+#   responses are written back in request order.
+# - Concurrent AC (or IC) requests for the same prefix share one computation.
+# - IC needs the trigram index of dictionary.infix_dictionary, see --infix.
+# - Reads run in a thread pool and proceed together; A / D go through a
+#   single writer that waits for running reads to finish and holds new ones
+#   back while it applies the mutation.
+# - Within a connection, a read never overtakes an earlier mutation and a
+#   mutation never overtakes earlier reads.
+# - With --journal, a mutation is answered once its journal record is on
+#   disk; the mutations waiting at the same time share one fsync.
+#
+# Reads run concurrently, so the backend's search and autocomplete must not
+# mutate it (e.g. not a self-organising linked list); use --reader-threads 1
+# otherwise.
+# -------------------------------------------------------------------
+
+class ReadWriteLock:
+    '''
+    Asyncio readers-writer lock that prefers a waiting writer over new readers
+    '''
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    async def acquire_read(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._writers_waiting)
+            self._readers += 1
+
+    async def release_read(self):
+        async with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    async def acquire_write(self):
+        async with self._condition:
+            self._writers_waiting += 1
+            await self._condition.wait_for(lambda: not self._writer and not self._readers)
+            self._writers_waiting -= 1
+            self._writer = True
+
+    async def release_write(self):
+        async with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+
+class DictionaryServer:
+
+    def __init__(self, agent: BaseDictionary, reader_threads: int = 4, journaled: JournaledDictionary = None):
+        """
+        @param journaled: the journal wrapper inside 'agent', if any, whose records are committed before answering
+        """
+        self.agent = agent
+        self.journaled = journaled
+        self.lock = ReadWriteLock()
+        self.readers = ThreadPoolExecutor(max_workers=reader_threads)
+        self.inflight: dict[tuple, asyncio.Future] = {}  # AC/IC command being computed -> its shared result
+        self.coalesced = 0
+
+    async def _read(self, command: tuple):
+        loop = asyncio.get_running_loop()
+        # identical concurrent autocompletes share the computation already under way
+        if command[0] != 'S' and command in self.inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self.inflight[command])
+        if command[0] == 'S':
+            method = self.agent.search
+        elif command[0] == 'AC':
+            method = self.agent.autocomplete
+        elif isinstance(self.agent, InfixDictionary):
+            method = self.agent.infix_search
+        else:
+            raise ValueError('infix search needs a server started with --infix')
+        shared = loop.create_future() if command[0] != 'S' else None
+        if shared is not None:
+            self.inflight[command] = shared
+        await self.lock.acquire_read()
+        try:
+            result = await loop.run_in_executor(self.readers, method, *command[1:])
+        except Exception as error:
+            if shared is not None:
+                shared.set_exception(error)
+                shared.exception()  # mark it retrieved for waiters that never came
+            raise
+        finally:
+            await self.lock.release_read()
+            if shared is not None:
+                del self.inflight[command]
+        if shared is not None:
+            shared.set_result(result)
+
+        return result
+
+    async def _write(self, command: tuple):
+        await self.lock.acquire_write()
+        try:
+            if command[0] == 'A':
+                result = self.agent.add_word_frequency(WordFrequency(command[1], command[2]))
+            else:
+                result = self.agent.delete_word(command[1])
+        finally:
+            await self.lock.release_write()
+        # outside the lock, so the writers queued behind this one append before the fsync and share it
+        if self.journaled is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.journaled.commit)
+
+        return result
+
+    async def _execute(self, line: str, after: [asyncio.Task]) -> str:
+        """
+        run one command line once the tasks it must follow have finished
+        @return: the response line
+        """
+        try:
+            command = parse_command(line)
+        except (ValueError, IndexError):
+            return 'Unknown command.\n'
+        if after:
+            await asyncio.wait(after)
+        try:
+            if command[0] in ('S', 'AC', 'IC'):
+                result = await self._read(command)
+            else:
+                result = await self._write(command)
+        except Exception as error:
+            return f'Error: {error}\n'
+
+        return format_result(command, result)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        responses = asyncio.Queue()
+        sender = asyncio.create_task(self._send_responses(responses, writer))
+        last_mutation = None        # reads wait for the latest mutation of this connection
+        reads_since = []            # a mutation waits for the reads sent before it
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode('utf-8')
+                if not line.strip():
+                    continue
+                if line.split()[0] in ('A', 'D'):
+                    after = reads_since + ([last_mutation] if last_mutation else [])
+                    task = asyncio.create_task(self._execute(line, after))
+                    last_mutation = task
+                    reads_since = []
+                else:
+                    task = asyncio.create_task(self._execute(line, [last_mutation] if last_mutation else []))
+                    reads_since.append(task)
+                    if len(reads_since) > 1024:
+                        reads_since = [read for read in reads_since if not read.done()]
+                await responses.put(task)
+        finally:
+            await responses.put(None)
+            await sender
+
+    async def _send_responses(self, responses: asyncio.Queue, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                task = await responses.get()
+                if task is None:
+                    break
+                writer.write((await task).encode('utf-8'))
+                # flush once the pipeline has caught up, or when the buffer fills
+                if responses.empty() or writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(options):
+    agent = load_agent(options.approach, options.data, options.journal, options.merge, options.infix)
+    # the journal sits under the infix index, if there is one
+    journaled = agent.agent if isinstance(agent, InfixDictionary) else agent
+    server = DictionaryServer(agent, options.reader_threads, journaled if options.journal else None)
+    if options.unix:
+        listener = await asyncio.start_unix_server(server.handle_client, options.unix)
+        print(f'Serving {options.approach} on {options.unix}', file=sys.stderr)
+    else:
+        listener = await asyncio.start_server(server.handle_client, options.host, options.port)
+        print(f'Serving {options.approach} on {options.host}:{options.port}', file=sys.stderr)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        # commit the journal and stop the workers of a sharded backend
+        close_agent(agent)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Serve a dictionary over the command file protocol.')
+    parser.add_argument('approach', choices=list(BACKENDS), help='dictionary implementation')
+    parser.add_argument('data', help='data file (or .snap snapshot) to load once')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP address to listen on')
+    parser.add_argument('--port', type=int, default=7070, help='TCP port to listen on')
+    parser.add_argument('--unix', help='listen on this Unix socket path instead of TCP')
+    parser.add_argument('--reader-threads', type=int, default=4, help='threads running reads concurrently')
+    parser.add_argument('--infix', action='store_true', help='index the words for infix search (IC commands)')
+    parser.add_argument('--journal', help='journal directory to recover from and record every A / D in')
+    parser.add_argument('--merge', action='append', default=[], metavar='DELTA_FILE',
+                        help='file of word/delta lines folded into the words once loaded, may be repeated')
+    options = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(options))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -35,6 +35,16 @@
 #       file of "test1.in", then we should have expected files "test1.out".
 #
 #
+#   options file: a test may come with a "<test>.args" file next to its input file, e.g. "testMerge.args".
+#       Each of its lines is one run of the python program with these extra arguments, and the output of
+#       the last run is compared against the expected file. The runs of a test share a temporary
+#       directory, so a later run can recover what an earlier one wrote:
+#           {dir}       is replaced by the directory of the input files
+#           {tmp}       is replaced by the temporary directory of the test
+#           --snapshot  runs on a snapshot of the data file, written by "python -m dictionary.snapshot";
+#                       the test is skipped for implementations without snapshots
+#
+#
 # As an example, I can run the code as follows when testing code directory "Assign1-s1234",
 # the data file is named "sampleData.txt",
 # all my input command and expected files are located in the same folder,
@@ -56,9 +66,11 @@ import getopt
 import os
 import os.path
 import re
+import shutil
 import sys
 import subprocess as sp
 import difflib
+import tempfile
 
 
 def main():
@@ -95,7 +107,9 @@ def main():
     lsInFile = remainArgs[3:]
 
     # check implementation
-    setValidImpl = set(["array", "linkedlist", "trie"])
+    setValidImpl = set(["array", "columnar", "linkedlist", "trie", "radixtrie", "statictrie", "sharded", "hashtable"])
+    # implementations that can load a snapshot of the data file
+    setSnapshotImpl = set(["columnar", "statictrie"])
     if sImpl not in setValidImpl:
         print(sImpl + " is not a valid implementation name.")
         sys.exit(1)
@@ -110,6 +124,7 @@ def main():
     failedNum = 0
     lsTestPassed = []
     lsTestFailed = []
+    lsTestSkipped = []
     print('')
 
     # check if python file exists
@@ -128,21 +143,44 @@ def main():
                 print(sExpectedFile + " is missing.")
                 continue
 
-            sCommand = 'python {sExec} {sImpl} "{sDataFile}" "{sInFile}" "{sOutputFile}"'.format(sExec=sExec,
-                                                                                                 sImpl=sImpl,
-                                                                                                 sDataFile=sDataFile,
-                                                                                                 sInFile=sInFile,
-                                                                                                 sOutputFile=sOutputFile)
-            # print(sCommand)
+            # extra arguments of each run, from the options file if there is one
+            sArgsFile = os.path.splitext(sInFile)[0] + ".args"
+            lsRunArgs = [""]
+            if os.path.isfile(sArgsFile):
+                with open(sArgsFile, "r") as fArgs:
+                    lsRunArgs = [line.strip() for line in fArgs if len(line.strip()) > 0]
+
+            sTempDir = tempfile.mkdtemp()
+            sTestDataFile = sDataFile
+            if any("--snapshot" in sRunArgs.split() for sRunArgs in lsRunArgs):
+                if sImpl not in setSnapshotImpl:
+                    lsTestSkipped.append(sTestName)
+                    shutil.rmtree(sTempDir)
+                    continue
+                sTestDataFile = os.path.join(sTempDir, "data.snap")
+                sp.call('python -m dictionary.snapshot {sImpl} "{sDataFile}" "{sSnapFile}"'.format(
+                    sImpl=sImpl, sDataFile=sDataFile, sSnapFile=sTestDataFile), shell=True)
+
+            for sRunArgs in lsRunArgs:
+                lsArgs = [sArg.replace("{dir}", os.path.dirname(sInFile)).replace("{tmp}", sTempDir)
+                          for sArg in sRunArgs.split() if sArg != "--snapshot"]
+                sCommand = 'python {sExec} {sImpl} "{sDataFile}" "{sInFile}" "{sOutputFile}"'.format(sExec=sExec,
+                                                                                                     sImpl=sImpl,
+                                                                                                     sDataFile=sTestDataFile,
+                                                                                                     sInFile=sInFile,
+                                                                                                     sOutputFile=sOutputFile)
+                sCommand += "".join(' "{sArg}"'.format(sArg=sArg) for sArg in lsArgs)
+                # print(sCommand)
 
-            if bVerbose:
-                print("Testing: " + sCommand)
-            proc = sp.Popen(sCommand, shell=True, stderr=sp.PIPE)
+                if bVerbose:
+                    print("Testing: " + sCommand)
+                proc = sp.Popen(sCommand, shell=True, stderr=sp.PIPE)
 
-            (sStdout, sStderr) = proc.communicate()
+                (sStdout, sStderr) = proc.communicate()
 
-            if bVerbose and len(sStderr) > 0:
-                print("\nWarnings and error messages from running python program:\n" + sStderr)
+                if bVerbose and len(sStderr) > 0:
+                    print("\nWarnings and error messages from running python program:\n" + sStderr.decode())
+            shutil.rmtree(sTempDir)
 
             # compare expected with output
             bPassed, bFailedOutput = evaluate(sExpectedFile, sOutputFile)
@@ -163,7 +201,8 @@ def main():
 
     print("\nSUMMARY: " + sExec + " has passed " + str(passedNum) + " out of " + str(len(lsInFile)) + " tests.")
     print("PASSED: " + ", ".join(lsTestPassed))
-    print("FAILED: " + ", ".join(lsTestFailed) + "\n")
+    print("FAILED: " + ", ".join(lsTestFailed))
+    print("SKIPPED: " + ", ".join(lsTestSkipped) + "\n")
 
     # print out the mark
     # if sImpl in ["array", "linkedlist"]: